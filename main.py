@@ -537,18 +537,35 @@ import os
 import pickle
 import json
 import base64
+import asyncio
 from uuid import uuid4
 from datetime import datetime
 from typing import Optional, List
 
-from fastapi import FastAPI, HTTPException, Request, Body, Form, UploadFile, File
+from fastapi import FastAPI, HTTPException, Request, Body, Form, UploadFile, File, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import RedirectResponse, Response
 from pydantic import BaseModel
 
-from services.gmail_auth import get_gmail_service
+from services.gmail_auth import get_gmail_service, invalidate_gmail_service
 from services import email_storage
 from services.ai_writer import generate_email, generate_smart_email, score_lead
+from services.ai_writer import stream_email, stream_smart_email
+from services.followagent import generate_followups, FOLLOWUP_BATCH_SIZE
+from services.sse import sse_response
+from services.gen_cache import generation_cache
+from services.agent_registry import run_in_ai_loop
+from services.lead_store import LeadStore, migrate_legacy_leads
+from services.pagination import paginate, ndjson_response, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from services.journal import Journal
+from services.email_index import EmailIndex
+from services import send_engine
+from services.job_queue import JobQueue
+from services import inbox_predictor
+from services import lead_scoring
+from services import tracking
+from services.cadence import CadenceScheduler
+from services.send_ledger import send_ledger
 
 # ------------------- Config -------------------
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"  # for localhost dev
@@ -556,6 +573,9 @@ TOKEN_PATH = "token.pkl"
 CLIENT_SECRET_FILE = "client_secret.json"
 FRONTEND_URL = "https://mailmorph-com.vercel.app/"
 LEADS_FILE = "leads.pkl"
+LEADS_DB = "leads.db"
+JOBS_DB = "jobs.db"
+FOLLOWUP_CONCURRENCY = int(os.getenv("FOLLOWUP_CONCURRENCY", "8"))  # parallel AI generations
 USERS_FILE = "users.json"
 UPLOAD_DIR = "uploads"
 
@@ -599,6 +619,7 @@ class Lead(BaseModel):
     opened: int | None = 0
     clicked: int | None = 0
     replied: bool | None = False
+    score_value: float | None = None
 
 class User(BaseModel):
     id: int | None = None
@@ -619,8 +640,10 @@ def load_pickle(path):
             return pickle.load(f)
     return []
 
-def save_leads(leads: list): save_pickle(LEADS_FILE, leads)
-def load_leads(): return load_pickle(LEADS_FILE)
+lead_store = LeadStore(LEADS_DB)
+migrate_legacy_leads(lead_store, pickle_path=LEADS_FILE)
+
+job_queue = JobQueue(JOBS_DB)
 
 def load_users():
     if not os.path.exists(USERS_FILE):
@@ -637,6 +660,18 @@ def save_users(users):
 def health():
     return {"ok": True}
 
+# ------------------- Background Jobs -------------------
+@app.on_event("startup")
+def start_job_workers():
+    job_queue.start()
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
 # ------------------- Gmail OAuth -------------------
 @app.get("/auth/login")
 def auth_login():
@@ -672,6 +707,7 @@ def auth_callback(request: Request):
         creds = flow.credentials
         with open(TOKEN_PATH, "wb") as f:
             pickle.dump(creds, f)
+        invalidate_gmail_service()
 
         service = get_gmail_service()
         profile = service.users().getProfile(userId="me").execute()
@@ -714,6 +750,7 @@ def auth_logout():
     try:
         if os.path.exists(TOKEN_PATH):
             os.remove(TOKEN_PATH)
+        invalidate_gmail_service()
         return {"ok": True, "message": "Logged out"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -735,15 +772,24 @@ def _get_header(headers, name):
 
 # ------------------- Email Send -------------------
 @app.post("/send")
-def api_send(req: SendReq):
+def api_send(req: SendReq, idempotency_key: Optional[str] = Header(None)):
     try:
         service = get_gmail_service()
         if not service:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        message = _create_message(req.to, req.subject, req.body)
-        sent = service.users().messages().send(userId="me", body=message).execute()
+        # retries with the same Idempotency-Key hit the send ledger instead of Gmail
+        msg = {"to": req.to, "subject": req.subject, "body": req.body}
+        if idempotency_key:
+            msg["campaign"] = f"send:{idempotency_key}"
+        sent = send_engine.send_one(msg)
         thread_id = sent.get("threadId")
+        if sent.get("duplicate"):
+            if sent["ledger_status"] != "sent":
+                # the first attempt died mid-send; we can't tell whether it went out
+                return {"ok": False, "status": "unknown", "duplicate": True,
+                        "error": send_engine.UNCONFIRMED_SEND}
+            return {"ok": True, "status": "sent", "threadId": thread_id, "duplicate": True}
 
         email_storage.save_email({
             "id": str(uuid4()),
@@ -778,15 +824,13 @@ def api_reply(req: ReplyReq):
         message["threadId"] = req.threadId
         service.users().messages().send(userId="me", body=message).execute()
 
-        existing = email_storage.load_replies()
-        existing.append({
+        email_storage.add_reply({
             "from": "me",
             "subject": subject,
             "body": req.body,
             "threadId": req.threadId,
             "timestamp": str(datetime.utcnow())
         })
-        email_storage.save_replies(existing)
         return {"ok": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -800,6 +844,10 @@ async def api_generate_reply(req: GenerateReq):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/ai/cache-stats")
+def api_generation_cache_stats():
+    return generation_cache.stats()
+
 @app.post("/generate-smart-email")
 async def api_generate_smart_email(req: GenerateReq):
     try:
@@ -808,21 +856,42 @@ async def api_generate_smart_email(req: GenerateReq):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Streaming variants: tokens are pushed to the client as server-sent events
+@app.post("/generate-reply/stream")
+async def api_generate_reply_stream(req: GenerateReq):
+    return sse_response(stream_email(req.subject, req.body))
+
+@app.post("/generate-smart-email/stream")
+async def api_generate_smart_email_stream(req: GenerateReq):
+    return sse_response(stream_smart_email(req.subject, req.body, req.to))
+
 # ------------------- Sent / Replies -------------------
 @app.get("/sent")
-def api_sent():
+def api_sent(limit: Optional[int] = None, cursor: Optional[int] = None):
     try:
-        return {"items": email_storage.load_emails()}
+        if limit is None and cursor is None:
+            return {"items": email_storage.load_emails()}
+        return paginate(email_storage.iter_emails(cursor), limit, cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/sent/stream")
+def api_sent_stream(cursor: Optional[int] = None):
+    return ndjson_response(email_storage.iter_emails(cursor), cursor)
+
 @app.get("/replies")
-def api_replies():
+def api_replies(limit: Optional[int] = None, cursor: Optional[int] = None):
     try:
-        return {"items": email_storage.load_replies()}
+        if limit is None and cursor is None:
+            return {"items": email_storage.load_replies()}
+        return paginate(email_storage.iter_replies(cursor), limit, cursor)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/replies/stream")
+def api_replies_stream(cursor: Optional[int] = None):
+    return ndjson_response(email_storage.iter_replies(cursor), cursor)
+
 # ------------------- Email Tagging -------------------
 class TagReq(BaseModel):
     threadId: str
@@ -830,35 +899,69 @@ class TagReq(BaseModel):
 
 @app.post("/email/tag")
 def set_email_tags(req: TagReq):
-    emails = email_storage.load_emails()
-    updated = None
-    for e in emails:
-        if e.get("threadId") == req.threadId:
-            e["tags"] = req.tags
-            updated = e
-            break
+    updated = email_storage.set_tags(req.threadId, req.tags)
     if not updated:
         raise HTTPException(status_code=404, detail="Email not found")
-
-    email_storage.save_emails(emails)
     return {"ok": True, "email": updated}
 
 # ------------------- Leads API -------------------
 @app.post("/lead/add")
 def add_lead(lead: Lead):
-    leads = load_leads()
-    lead.id = len(leads) + 1
     lead_dict = lead.dict()
-    if "opened" not in lead_dict: lead_dict["opened"] = 0
-    if "clicked" not in lead_dict: lead_dict["clicked"] = 0
-    if "replied" not in lead_dict: lead_dict["replied"] = False
-    leads.append(lead_dict)
-    save_leads(leads)
+    lead_dict.pop("id", None)  # ids are assigned by the store
+    lead_store.add(lead_dict)
     return {"ok": True, "message": "Lead added successfully"}
 
 @app.get("/lead/list")
-def list_leads():
-    return {"items": load_leads()}
+def list_leads(limit: Optional[int] = None, cursor: Optional[int] = None):
+    if limit is None and cursor is None:
+        return {"items": lead_store.select()}
+    page_size = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE) + 1
+    return paginate(lead_store.iter_after(cursor, batch=page_size), limit)
+
+# score labels accepted by /lead/query besides the exact stored label
+SCORE_LABELS = {"hot": lead_scoring.HOT, "warm": lead_scoring.WARM, "cold": lead_scoring.COLD}
+
+@app.get("/lead/query")
+def query_leads(
+    status: Optional[str] = None,
+    label: Optional[str] = None,
+    company: Optional[str] = None,
+    contacted_after: Optional[str] = None,
+    contacted_before: Optional[str] = None,
+    replied: Optional[bool] = None,
+    sort: str = "id",
+    order: str = "asc",
+    limit: Optional[int] = None,
+    cursor: Optional[str] = None,
+):
+    """
+    Filter and sort leads server-side. Filters run on indexed columns;
+    follow `next_cursor` for the next page.
+    """
+    # last_contacted is stored as "YYYY-MM-DD HH:MM:SS", accept ISO "T" too
+    def as_stored(ts):
+        return ts.replace("T", " ") if ts else ts
+
+    try:
+        return lead_store.query(
+            status=status,
+            score=SCORE_LABELS.get(label.lower(), label) if label else None,
+            company=company,
+            contacted_after=as_stored(contacted_after),
+            contacted_before=as_stored(contacted_before),
+            replied=replied,
+            sort=sort,
+            descending=order.lower() == "desc",
+            limit=max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)),
+            cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/lead/list/stream")
+def list_leads_stream(cursor: Optional[int] = None):
+    return ndjson_response(lead_store.iter_after(cursor))
 
 @app.post("/lead/delete")
 def delete_lead(lead: dict = Body(...)):
@@ -866,66 +969,278 @@ def delete_lead(lead: dict = Body(...)):
     if not lead_id:
         raise HTTPException(status_code=400, detail="Lead ID required")
 
-    leads = load_leads()
-    new_leads = [l for l in leads if l.get("id") != lead_id]
-
-    if len(new_leads) == len(leads):
+    if not lead_store.delete(lead_id):
         return {"ok": False, "message": "Lead not found"}
 
-    for i, l in enumerate(new_leads, start=1):
-        l["id"] = i
-
-    save_leads(new_leads)
     return {"ok": True, "message": f"Lead {lead_id} deleted successfully"}
 
 @app.post("/lead/followup")
-async def lead_followup():
-    leads = load_leads()
-    updated_count = 0
+def lead_followup(idempotency_key: Optional[str] = Header(None)):
+    def enqueue():
+        total = len(lead_store.select(status="new"))
+        job_id = job_queue.enqueue("lead_followup", {}, total=total)
+        return {"ok": True, "job_id": job_id, "status": "queued", "total": total}
+
+    if not idempotency_key:
+        return enqueue()
+    response, replayed = send_ledger.once(f"lead-followup:{idempotency_key}", enqueue)
+    return {**response, "duplicate": True} if replayed else response
+
+async def _run_lead_followup(job):
+    """
+    Generate emails FOLLOWUP_BATCH_SIZE leads per LLM request, up to
+    FOLLOWUP_CONCURRENCY requests at once, and hand them to sender tasks as
+    they finish, so LLM calls overlap with Gmail sends. Blocking sends run
+    in worker threads, off the event loop.
+
+    The lead list is fixed in the job checkpoint on the first run and every
+    generated email is stored before it is sent, so a restarted job picks
+    up the leads that weren't acknowledged yet without regenerating content.
+    """
+    if job.checkpoint is None:
+        lead_ids = [lead["id"] for lead in lead_store.select(status="new")]
+        job.set_total(len(lead_ids))
+        job.save_checkpoint({"lead_ids": lead_ids})
+    stored = job.items("lead:")
+    can_send = get_gmail_service() is not None
+
+    def item_key(lead_id):
+        return f"lead:{lead_id:010d}"
+
+    generated, to_generate = [], []
+    for lead_id in job.checkpoint["lead_ids"]:
+        content, status = stored.get(item_key(lead_id), (None, "ready"))
+        if status != "ready":
+            continue
+        lead = lead_store.get(lead_id)
+        if lead is None:
+            job.store_items({item_key(lead_id): None})
+            job.finish_item(item_key(lead_id), ok=False)
+        elif content is not None:
+            generated.append((lead, json.loads(content)))
+        else:
+            to_generate.append(lead)
+    batches = [to_generate[i:i + FOLLOWUP_BATCH_SIZE] for i in range(0, len(to_generate), FOLLOWUP_BATCH_SIZE)]
+
+    generate_slots = asyncio.Semaphore(FOLLOWUP_CONCURRENCY)
+    ready = asyncio.Queue(maxsize=FOLLOWUP_CONCURRENCY * FOLLOWUP_BATCH_SIZE * 2)
+
+    async def replay():
+        for item in generated:
+            await ready.put(item)
+
+    async def generate(batch):
+        async with generate_slots:
+            bodies = await generate_followups(batch)
+        emails = [
+            {"subject": f"Hi {lead.get('name','') or 'there'}, just following up", "body": body}
+            for lead, body in zip(batch, bodies)
+        ]
+        job.store_items({item_key(lead["id"]): json.dumps(email) for lead, email in zip(batch, emails)})
+        for item in zip(batch, emails):
+            await ready.put(item)
+
+    async def send():
+        while (item := await ready.get()) is not None:
+            lead, email = item
+            try:
+                if can_send:
+                    # a lead gets its first follow-up once, however often the job is retried
+                    await asyncio.to_thread(
+                        send_engine.send_one,
+                        {"to": lead["email"], **email, "campaign": f"lead_followup:{lead['id']}",
+                         "lead_id": lead["id"]},
+                    )
+                lead_store.update(lead["id"], status="contacted", last_contacted=str(datetime.utcnow()))
+                job.finish_item(item_key(lead["id"]), ok=True)
+            except Exception as e:
+                print(f"[Follow-up] Failed to send to {lead['email']}: {e}")
+                job.finish_item(item_key(lead["id"]), ok=False)
+
+    senders = [asyncio.create_task(send()) for _ in range(send_engine.SEND_WORKERS)]
+    producers = [asyncio.create_task(replay())] + [asyncio.create_task(generate(b)) for b in batches]
+    try:
+        await asyncio.gather(*producers)
+    finally:
+        # on failure stop the other producers, then let the senders drain what
+        # is already queued and exit, so no task outlives the job
+        for task in producers:
+            task.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+        for _ in senders:
+            await ready.put(None)
+        await asyncio.gather(*senders)
+
+    updated_count = sum(1 for _, status in job.items("lead:").values() if status == "sent")
+    return {"ok": True, "updated_count": updated_count}
 
-    for i, lead in enumerate(leads):
-        if lead["status"] == "new":
-            subject = f"Hi {lead.get('name','') or 'there'}, just following up"
-            service_offer = f"services we can offer to {lead.get('company','your company')}"
-            body = await generate_email(lead.get("company", "your company"), service_offer)
+job_queue.register("lead_followup", lambda job: run_in_ai_loop(_run_lead_followup(job)))
 
-            service = get_gmail_service()
-            if service:
-                message = _create_message(lead["email"], subject, body)
-                service.users().messages().send(userId="me", body=message).execute()
+# ------------------- Follow-up Cadences -------------------
+# Leads enrolled in a cadence get a follow-up at every step (e.g. day 0, 3, 7)
+# until they reply; services/cadence.py decides who is due on each tick.
+class CadenceEnrollReq(BaseModel):
+    lead_ids: Optional[List[int]] = None  # default: every "new" lead
+    cadence: str = "default"
 
-            lead["status"] = "contacted"
-            lead["last_contacted"] = str(datetime.utcnow())
-            leads[i] = lead
-            updated_count += 1
+class CadenceStopReq(BaseModel):
+    lead_id: int
 
-    save_leads(leads)
-    return {"ok": True, "updated_count": updated_count}
+async def _generate_followup_bodies(leads):
+    slots = asyncio.Semaphore(FOLLOWUP_CONCURRENCY)
 
-# ------------------- Smart Lead Scoring -------------------
-def _calculate_label_for_lead(lead: dict) -> str:
+    async def generate(batch):
+        # every cadence step should read differently, so these skip the cache
+        async with slots:
+            return await generate_followups(batch, use_cache=False)
+
+    batches = [leads[i:i + FOLLOWUP_BATCH_SIZE] for i in range(0, len(leads), FOLLOWUP_BATCH_SIZE)]
+    return [body for bodies in await asyncio.gather(*(generate(b) for b in batches)) for body in bodies]
+
+def _cadence_subject(lead: dict, step: int) -> str:
+    name = lead.get("name") or "there"
+    if step == 0:
+        return f"Hi {name}, just following up"
+    return f"Checking in again, {name}"
+
+def _touch_cadence_leads(due):
+    """
+    Send one cadence step to each due lead. Leads that replied or were
+    deleted leave their cadence; without a Gmail login nothing is sent and
+    every lead is retried later.
+    """
+    if get_gmail_service() is None:
+        return {}
+    outcomes, pending = {}, []
+    for lead_id, step, enrolled_at in due:
+        lead = lead_store.get(lead_id)
+        if lead is None or lead["replied"]:
+            outcomes[lead_id] = "stop"
+        else:
+            pending.append((lead, step, f"cadence:{lead_id}:{enrolled_at}:{step}"))
+    if not pending:
+        return outcomes
+
+    bodies = run_in_ai_loop(_generate_followup_bodies([lead for lead, _, _ in pending]))
+    messages = [
+        {"to": lead["email"], "subject": _cadence_subject(lead, step), "body": body,
+         "campaign": campaign, "lead_id": lead["id"]}
+        for (lead, step, campaign), body in zip(pending, bodies)
+    ]
+    results = send_engine.send_many(messages)
+
+    timestamp = str(datetime.utcnow())
+    sent = []
+    for (lead, _, _), message, r in zip(pending, messages, results):
+        # an unconfirmed earlier attempt is never resent, so retrying it would loop
+        outcomes[lead["id"]] = "sent" if r["ok"] or r.get("status") == "unknown" else "failed"
+        if r["ok"]:
+            lead_store.update(lead["id"], status="contacted", last_contacted=timestamp)
+        if r["ok"] and not r.get("duplicate"):
+            message = {k: v for k, v in message.items() if k not in ("campaign", "lead_id")}
+            sent.append({"id": str(uuid4()), **message, "threadId": r["threadId"],
+                         "timestamp": timestamp, "tags": []})
+    email_storage.save_emails_batch(sent)
+    return outcomes
+
+cadence_scheduler = CadenceScheduler(_touch_cadence_leads)
+
+@app.on_event("startup")
+def start_cadence_scheduler():
+    cadence_scheduler.start()
+
+@app.on_event("shutdown")
+def stop_cadence_scheduler():
+    cadence_scheduler.shutdown()
+
+@app.post("/cadence/enroll")
+def cadence_enroll(req: CadenceEnrollReq = Body(CadenceEnrollReq())):
+    lead_ids = req.lead_ids
+    if lead_ids is None:
+        lead_ids = [lead["id"] for lead in lead_store.select(status="new")]
     try:
-        if lead.get("replied", False):
-            return "Hot 🔥"
-        if lead.get("status", "") == "contacted":
-            return "Warm 🙂"
-        if int(lead.get("opened", 0)) >= 1 or int(lead.get("clicked", 0)) >= 1:
-            return "Warm 🙂"
-    except Exception:
-        pass
-    return "Cold ❄️"
+        enrolled = cadence_scheduler.enroll(lead_ids, req.cadence)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ok": True, "enrolled": enrolled, "cadence": req.cadence}
+
+@app.post("/cadence/stop")
+def cadence_stop(req: CadenceStopReq):
+    if not cadence_scheduler.stop(req.lead_id):
+        raise HTTPException(status_code=404, detail="Lead is not on an active cadence")
+    return {"ok": True}
+
+@app.get("/cadence/status")
+def cadence_status():
+    return cadence_scheduler.status()
+
+# ------------------- Open / Click Tracking -------------------
+# Lead follow-ups and cadence touches carry a signed open pixel and click
+# links (services/tracking.py) when TRACKING_SECRET and TRACKING_BASE_URL
+# are set. Events land in an in-memory ring buffer; a background flusher
+# adds them to the lead counters every TRACKING_FLUSH_SECONDS.
+tracking_flusher = tracking.TrackingFlusher(tracking.tracking_buffer, lead_store)
+
+@app.on_event("startup")
+def start_tracking_flusher():
+    if not tracking.enabled():
+        print("[Tracking] TRACKING_SECRET / TRACKING_BASE_URL not set; open and click tracking is off")
+    tracking_flusher.start()
+
+@app.on_event("shutdown")
+def stop_tracking_flusher():
+    tracking_flusher.stop()
+
+_PIXEL_HEADERS = {"Cache-Control": "no-store, no-cache, must-revalidate, max-age=0"}
+
+@app.get("/t/open/{lead_id}.gif")
+async def track_open(lead_id: int, sig: Optional[str] = None):
+    # unsigned opens still get the pixel but are not counted
+    if tracking.valid_open(lead_id, sig):
+        tracking.tracking_buffer.record(tracking.OPEN, lead_id)
+    return Response(content=tracking.PIXEL_GIF, media_type="image/gif", headers=_PIXEL_HEADERS)
+
+@app.get("/t/click/{lead_id}")
+async def track_click(lead_id: int, url: str, sig: Optional[str] = None):
+    if not tracking.valid_redirect(lead_id, url, sig):
+        raise HTTPException(status_code=400, detail="Invalid tracking link")
+    tracking.tracking_buffer.record(tracking.CLICK, lead_id)
+    return RedirectResponse(url, status_code=302)
+
+@app.get("/tracking/stats")
+def tracking_stats():
+    return tracking.tracking_buffer.stats()
+
+# ------------------- Smart Lead Scoring -------------------
+# Stored score values decay with days since last contact, so every lead
+# is rescored once per LEAD_RESCORE_HOURS on top of the incremental runs.
+score_refresher = lead_scoring.ScoreRefresher(lead_store)
+
+@app.on_event("startup")
+def start_score_refresher():
+    score_refresher.start()
+
+@app.on_event("shutdown")
+def stop_score_refresher():
+    score_refresher.shutdown()
 
 @app.post("/lead/score")
-def lead_score():
-    leads = load_leads()
-    updated = []
-    for i, lead in enumerate(leads):
-        label = _calculate_label_for_lead(lead)
-        lead["score"] = label
-        leads[i] = lead
-        updated.append(lead)
-    save_leads(leads)
-    return {"ok": True, "items": updated}
+def lead_score(full: bool = False):
+    """
+    Score leads whose inputs changed since the last run (`full=true` rescores
+    all) and return every lead, as before.
+    """
+    result = lead_scoring.rescore(lead_store, full=full)
+    return {"ok": True, "items": lead_store.select(), "scored": result["scored"], "changed": result["changed"]}
+
+@app.post("/v2/lead/score")
+def lead_score_v2(full: bool = False):
+    """
+    Same scoring run, but `items` only holds the leads whose score changed,
+    as {id, score, score_value}, instead of the whole lead list.
+    Scoring runs column-wise in services/lead_scoring.py; only changed rows are written.
+    """
+    return {"ok": True, **lead_scoring.rescore(lead_store, full=full)}
 
 # ------------------- User API -------------------
 @app.patch("/user/update")
@@ -961,39 +1276,123 @@ async def update_user(
     return {"ok": True, "user": updated_user}
 
 # ------------------- Bulk Email Send -------------------
+# Pre-send deliverability check: "off", "warn" (report the verdict) or
+# "block" (refuse Spam-rated messages before any quota is spent). A request
+# may ask for a stricter gate than the server's, never a looser one.
+DELIVERABILITY_GATES = ("off", "warn", "block")  # loosest to strictest
+BULK_DELIVERABILITY_GATE = os.getenv("BULK_DELIVERABILITY_GATE", "off")
+if BULK_DELIVERABILITY_GATE not in DELIVERABILITY_GATES:
+    raise RuntimeError(f"BULK_DELIVERABILITY_GATE must be one of {DELIVERABILITY_GATES}")
+
 class BulkSendReq(BaseModel):
     to: List[str]
     subject: str
     body: str
+    deliverability_check: Optional[str] = None  # can only tighten BULK_DELIVERABILITY_GATE
+
+def _deliverability_gate(req: BulkSendReq):
+    requested = req.deliverability_check or "off"
+    if requested not in DELIVERABILITY_GATES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"deliverability_check must be one of {', '.join(DELIVERABILITY_GATES)}",
+        )
+    gate = max(requested, BULK_DELIVERABILITY_GATE, key=DELIVERABILITY_GATES.index)
+    if gate == "off":
+        return None
+    # the same campaign body is only scored once
+    verdict = inbox_predictor.predict_cached(req.subject, req.body)
+    if gate == "block" and verdict["verdict"] == "Spam":
+        raise HTTPException(
+            status_code=422,
+            detail={"error": "Message rated Spam, nothing was sent", "deliverability": verdict},
+        )
+    return verdict
 
 @app.post("/send-bulk")
-def api_send_bulk(req: BulkSendReq):
+def api_send_bulk(req: BulkSendReq, idempotency_key: Optional[str] = Header(None)):
+    deliverability = _deliverability_gate(req)
     try:
         service = get_gmail_service()
         if not service:
             raise HTTPException(status_code=401, detail="Not authenticated")
 
-        sent_threads = []
-        for recipient in req.to:
-            message = _create_message(recipient, req.subject, req.body)
-            sent = service.users().messages().send(userId="me", body=message).execute()
-            thread_id = sent.get("threadId")
-
-            email_storage.save_email({
-                "id": str(uuid4()),
-                "to": recipient,
-                "subject": req.subject,
-                "body": req.body,
-                "threadId": thread_id,
-                "timestamp": str(datetime.utcnow()),
-                "tags": []
-            })
-            sent_threads.append({"to": recipient, "threadId": thread_id})
-
-        return {"ok": True, "sent": sent_threads}
+        def enqueue():
+            # every recipient is recorded in the send ledger under this campaign,
+            # so a re-run of the job never mails anyone twice
+            campaign = f"bulk:{idempotency_key or uuid4()}"
+            payload = {**req.dict(), "deliverability": deliverability, "campaign": campaign}
+            job_id = job_queue.enqueue("send_bulk", payload, total=len(req.to))
+            response = {"ok": True, "job_id": job_id, "status": "queued", "total": len(req.to)}
+            if deliverability:
+                response["deliverability"] = deliverability
+            return response
+
+        if not idempotency_key:
+            return enqueue()
+        response, replayed = send_ledger.once(f"send-bulk:{idempotency_key}", enqueue)
+        return {**response, "duplicate": True} if replayed else response
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+SEND_CHECKPOINT_EVERY = 25  # recipients per durable checkpoint
+
+def _run_send_bulk(job):
+    """
+    Send in chunks of SEND_CHECKPOINT_EVERY recipients. After each chunk the
+    sent emails are stored and a checkpoint is saved with the progress, so
+    a restarted job resumes after the last acknowledged recipient. Anyone
+    mailed after that checkpoint is caught by the send ledger.
+    """
+    req = BulkSendReq(**job.payload)
+    campaign = job.payload.get("campaign") or f"bulk:{job.id}"
+    start = (job.checkpoint or {}).get("next", 0)
+
+    for i in range(start, len(req.to), SEND_CHECKPOINT_EVERY):
+        chunk = req.to[i:i + SEND_CHECKPOINT_EVERY]
+        results = send_engine.send_many(
+            [{"to": recipient, "subject": req.subject, "body": req.body, "campaign": campaign}
+             for recipient in chunk]
+        )
+
+        # stable ids: a chunk replayed after a crash doesn't store its emails twice
+        timestamp = str(datetime.utcnow())
+        entries = {}
+        for r in results:
+            email_id = f"{campaign}:{r['to']}"
+            if r["ok"] and r.get("threadId") and not email_storage.has_email(email_id):
+                entries[email_id] = {
+                    "id": email_id,
+                    "to": r["to"],
+                    "subject": req.subject,
+                    "body": req.body,
+                    "threadId": r["threadId"],
+                    "timestamp": timestamp,
+                    "tags": []
+                }
+        email_storage.save_emails_batch(list(entries.values()))
+
+        job.store_items({f"results:{i:08d}": json.dumps(results)}, status="done")
+        # ledger duplicates were handled by an earlier run, not sent now
+        duplicates = sum(1 for r in results if r.get("duplicate"))
+        sent = sum(1 for r in results if r["ok"] and not r.get("duplicate"))
+        job.save_checkpoint({"next": i + len(chunk)}, sent=sent,
+                            failed=len(results) - sent - duplicates, duplicates=duplicates)
+
+    results = [r for content, _ in job.items("results:").values() for r in json.loads(content)]
+    fresh = [r for r in results if not r.get("duplicate")]
+    return {
+        "ok": True,
+        "sent": [{"to": r["to"], "threadId": r["threadId"]} for r in fresh if r["ok"]],
+        "failed": [{"to": r["to"], "error": r["error"]} for r in fresh if not r["ok"]],
+        "duplicates": [{"to": r["to"], "threadId": r.get("threadId"),
+                        "status": r.get("status", "sent")} for r in results if r.get("duplicate")],
+        "results": results,
+        "deliverability": job.payload.get("deliverability"),
+    }
+
+job_queue.register("send_bulk", _run_send_bulk)
+
 # ------------------- Stripe Checkout -------------------
 import stripe
 stripe.api_key = os.getenv("STRIPE_SECRET_KEY")
@@ -1053,55 +1452,47 @@ class PredictionResult(BaseModel):
     suggestion: str
 
 # ------------------------
-# Simple keyword-based predictor
+# Keyword-based predictor (services/inbox_predictor.py)
 # ------------------------
-RISKY_WORDS = [
-    "free", "winner", "buy now", "click here", "limited offer", "discount",
-    "urgent", "prize", "act now", "exclusive deal", "offer expires", "congratulations",
-    "cash bonus", "earn money", "risk-free", "guaranteed", "credit card", "save big",
-    "deal of the day", "special promotion", "claim now", "limited time", "hot offer",
-    "cheap", "amazing", "bonus", "promotion", "investment opportunity", "double your income"
-]
-
-
-def predict_inbox(subject: str, body: str) -> PredictionResult:
-    text = f"{subject} {body}".lower()
-
-    # Detect risky words
-    detected = [word for word in RISKY_WORDS if re.search(r"\b" + re.escape(word) + r"\b", text)]
-
-    # Scoring: simple heuristic
-    score = max(0.0, 1.0 - 0.15 * len(detected))  # reduce score for each risky word
-
-    # Determine verdict
-    if score > 0.7:
-        verdict = "Inbox"
-        suggestion = "Looks safe! Minimal risky words detected."
-    elif 0.4 < score <= 0.7:
-        verdict = "Promotions"
-        suggestion = "Contains some promotional/risky words. Consider rephrasing."
-    else:
-        verdict = "Spam"
-        suggestion = "High risk of going to spam. Avoid risky words and clickbait."
-
-    return PredictionResult(
-        verdict=verdict,
-        score=round(score, 2),
-        risky_words=detected,
-        suggestion=suggestion
-    )
+@app.on_event("startup")
+def load_deliverability_model():
+    # optional: only used with PREDICT_MODE=model or ?mode=model
+    inbox_predictor.load_model()
+
+def predict_inbox(subject: str, body: str, mode: Optional[str] = None) -> PredictionResult:
+    return PredictionResult(**inbox_predictor.predict(subject, body, mode))
 
 # ------------------------
 # API Endpoint
 # ------------------------
 @app.post("/predict-inbox", response_model=PredictionResult)
-def api_predict(email: EmailContent):
+def api_predict(email: EmailContent, mode: Optional[str] = None):
     try:
-        result = predict_inbox(email.subject, email.body)
+        result = predict_inbox(email.subject, email.body, mode)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class BatchPredictReq(BaseModel):
+    emails: List[EmailContent]
+
+PREDICT_STREAM_THRESHOLD = 1000  # larger batches are streamed as NDJSON
+
+@app.post("/predict-inbox/batch")
+def api_predict_batch(req: BatchPredictReq, stream: bool = False, mode: Optional[str] = None):
+    """
+    Score many drafts in one request. Results come back in input order;
+    identical subject/body pairs are only scored once.
+    """
+    try:
+        results = inbox_predictor.predict_many(((e.subject, e.body) for e in req.emails), mode)
+        if stream or len(req.emails) > PREDICT_STREAM_THRESHOLD:
+            return ndjson_response(enumerate(results))
+        items = list(results)
+        return {"items": items, "count": len(items)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 
 
 
@@ -1121,50 +1512,46 @@ class ReplyList(BaseModel):
 
 
     # ------------------------
-DATA_FILE = "data/replies.json"
+DATA_FILE = "data/replies.json"  # legacy JSON array, imported once
 os.makedirs("data", exist_ok=True)
-if not os.path.exists(DATA_FILE):
-    with open(DATA_FILE, "w") as f:
-        json.dump([], f)
+
+replies_index = EmailIndex("data/replies.index.db")
+replies_log = Journal(
+    "data/replies.snapshot.jsonl",
+    "data/replies.journal.jsonl",
+    legacy_path=DATA_FILE,
+    index=replies_index,
+)
+replies_log.load()
 
 # ------------------------
 # Helpers
 # ------------------------
 def load_replies() -> List[Reply]:
-    with open(DATA_FILE, "r") as f:
-        data = json.load(f)
-    return [Reply(**item) for item in data]
+    return [Reply(**item) for item in replies_log.records()]
 
 def save_replies(replies: List[Reply]):
-    with open(DATA_FILE, "w") as f:
-        json.dump([r.dict() for r in replies], f, indent=2)
+    replies_log.rewrite([r.dict() for r in replies])
 
 # ------------------------
 # API Endpoints
 # ------------------------
 
-# Get all replies
-@app.get("/replies", response_model=List[Reply])
-def get_replies():
-    return load_replies()
-
 # Add a reply
 @app.post("/replies", response_model=Reply)
 def add_reply(reply: Reply):
     reply.generate_thread_id()
-    replies = load_replies()
-    replies.append(reply)
-    save_replies(replies)
+    replies_log.add(reply.dict())
     return reply
 
 # Delete a reply by threadId
 @app.delete("/replies/{thread_id}", response_model=dict)
 def delete_reply(thread_id: str):
-    replies = load_replies()
-    updated = [r for r in replies if r.threadId != thread_id]
-    if len(updated) == len(replies):
+    seqs = replies_index.seqs_for_thread(thread_id)
+    if not seqs:
         raise HTTPException(status_code=404, detail="Thread not found")
-    save_replies(updated)
+    for seq in seqs:
+        replies_log.delete(seq)
     return {"detail": "Deleted successfully"}
 
 # Clear all replies
@@ -0,0 +1,102 @@
+# services/agent_registry.py
+import os
+import asyncio
+import threading
+import weakref
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MODEL_NAME = "gpt-4o-mini"   # ⚡ Fast & efficient OpenAI model
+AI_MAX_CONNECTIONS = int(os.getenv("AI_MAX_CONNECTIONS", "20"))
+
+# ----------------- Lazy, shared OpenAI setup -----------------
+# Nothing here runs at import time. The agents SDK and the OpenAI client are
+# loaded on first use. httpx connection pools belong to the event loop that
+# opened them, so the client and the model configs built on it are kept
+# per loop; agents hold no client and are shared everywhere.
+_lock = threading.Lock()
+_agents = {}
+_per_loop = weakref.WeakKeyDictionary()  # loop -> {"client", "configs"}
+_ai_loop = None
+
+
+def _loop_state() -> dict:
+    loop = asyncio.get_running_loop()
+    with _lock:
+        state = _per_loop.get(loop)
+        if state is None:
+            state = _per_loop[loop] = {"client": None, "configs": {}}
+        return state
+
+
+def get_client():
+    """
+    The pooled AsyncOpenAI client for the running event loop.
+    """
+    state = _loop_state()
+    if state["client"] is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        import httpx
+
+        api_key = os.getenv("OPENAI_API_KEY")
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY not set in environment variables!")
+        state["client"] = AsyncOpenAI(
+            api_key=api_key,
+            http_client=DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=AI_MAX_CONNECTIONS,
+                    max_keepalive_connections=AI_MAX_CONNECTIONS,
+                )
+            ),
+        )
+    return state["client"]
+
+
+def get_run_config(model_settings: dict):
+    """
+    RunConfig for `model_settings`, built once per event loop.
+    """
+    key = tuple(sorted(model_settings.items()))
+    state = _loop_state()
+    config = state["configs"].get(key)
+    if config is None:
+        from agents import OpenAIChatCompletionsModel, ModelSettings
+        from agents.run import RunConfig
+
+        model = OpenAIChatCompletionsModel(model=MODEL_NAME, openai_client=get_client())
+        config = state["configs"][key] = RunConfig(
+            model=model,
+            tracing_disabled=True,
+            model_settings=ModelSettings(**model_settings),
+        )
+    return config
+
+
+def get_agent(name: str, instructions: str, **kwargs):
+    """
+    Build the named agent on first use and return the same instance afterwards.
+    The model comes from the RunConfig passed to Runner.run.
+    """
+    with _lock:
+        agent = _agents.get(name)
+        if agent is None:
+            from agents import Agent
+
+            agent = _agents[name] = Agent(name=name, instructions=instructions, **kwargs)
+        return agent
+
+
+def run_in_ai_loop(coro):
+    """
+    Run a coroutine from a worker thread on one long-lived event loop, so
+    background jobs keep reusing the same pooled client instead of opening
+    a new one per asyncio.run().
+    """
+    global _ai_loop
+    with _lock:
+        if _ai_loop is None:
+            _ai_loop = asyncio.new_event_loop()
+            threading.Thread(target=_ai_loop.run_forever, name="ai-loop", daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _ai_loop).result()
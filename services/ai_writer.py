@@ -92,48 +92,32 @@
 
 
 # services/ai_writer.py
-import os
+import json
 import random
-from dotenv import load_dotenv
 
-from agents import Agent, OpenAIChatCompletionsModel, Runner
-from agents.run import RunConfig
-from openai import AsyncOpenAI
+from services.agent_registry import MODEL_NAME, get_agent, get_run_config
+from services.gen_cache import generation_cache, make_key
 
-load_dotenv()
+# ----------------- Model Settings -----------------
+# The OpenAI client, model and RunConfig are created lazily by agent_registry
+MODEL_SETTINGS = {
+    "temperature": 0.7,
+    "max_tokens": 500,
+    "top_p": 0.9,
+}
 
-# ----------------- Setup OpenAI Client -----------------
-openai_api = os.getenv("OPENAI_API_KEY")
-if not openai_api:
-    raise ValueError("OPENAI_API_KEY not set in environment variables!")
-
-client = AsyncOpenAI(api_key=openai_api)
-
-# ----------------- Model Setup -----------------
-model = OpenAIChatCompletionsModel(
-    model="gpt-4o-mini",   # ⚡ Fast & efficient OpenAI model
-    openai_client=client
+# ----------------- Prompts & Fallbacks -----------------
+EMAIL_WRITER = (
+    "email-writer",
+    "You are a professional AI agent specialized in writing cold outreach emails.",
 )
-
-# ----------------- RunConfig -----------------
-config = RunConfig(
-    model=model,
-    model_provider=client,
-    tracing_disabled=True,
-    model_settings={
-        "temperature": 0.7,
-        "max_tokens": 500,
-        "top_p": 0.9,
-    }
+SMART_EMAIL_GENERATOR = (
+    "smart-email-generator",
+    "You generate 3 subject line options and tone recommendation for an email.",
 )
 
-# ----------------- AI Cold Email Generator -----------------
-async def generate_email(company, service_offer):
-    """
-    Generate a cold email using OpenAI API (Agent SDK)
-    """
-    try:
-        prompt = f"""
+def _email_prompt(company, service_offer) -> str:
+    return f"""
 Write a professional cold email to {company} offering the following service: {service_offer}.
 
 Requirements:
@@ -143,34 +127,20 @@ Requirements:
 - Include a clear call to action
 - Keep under 200 words
 """
-        agent = Agent(
-            name="email-writer",
-            instructions="You are a professional AI agent specialized in writing cold outreach emails.",
-            model=model
-        )
-        result = await Runner.run(agent, prompt, config=config)
-        return result.output_text.strip()
 
-    except Exception as e:
-        print(f"[AI Writer] Error generating email: {e}")
-        # Fallback plain template
-        return (
-            f"Subject: Partnership Opportunity with {company}\n\n"
-            f"Dear {company} Team,\n\n"
-            f"I hope this email finds you well. I'm reaching out to discuss a potential partnership opportunity "
-            f"that could benefit {company}.\n\n"
-            f"We offer {service_offer}, which could help your organization achieve its goals more efficiently.\n\n"
-            f"Would you be interested in a brief call to discuss how we might work together?\n\n"
-            f"Best regards,\n[Your Name]"
-        )
+def _fallback_email(company, service_offer) -> str:
+    return (
+        f"Subject: Partnership Opportunity with {company}\n\n"
+        f"Dear {company} Team,\n\n"
+        f"I hope this email finds you well. I'm reaching out to discuss a potential partnership opportunity "
+        f"that could benefit {company}.\n\n"
+        f"We offer {service_offer}, which could help your organization achieve its goals more efficiently.\n\n"
+        f"Would you be interested in a brief call to discuss how we might work together?\n\n"
+        f"Best regards,\n[Your Name]"
+    )
 
-# ----------------- AI Smart Email (Subject Hooks + Tone) -----------------
-async def generate_smart_email(draft_subject: str, draft_body: str, recipient: str):
-    """
-    Returns 3 subject line suggestions and tone recommendation
-    """
-    try:
-        prompt = f"""
+def _smart_email_prompt(draft_subject: str, draft_body: str, recipient: str) -> str:
+    return f"""
 You are an expert email strategist.
 
 Draft subject: {draft_subject}
@@ -187,19 +157,104 @@ Output format:
   "tone": "..."
 }}
 """
-        agent = Agent(
-            name="smart-email-generator",
-            instructions="You generate 3 subject line options and tone recommendation for an email.",
-            model=model
-        )
-        result = await Runner.run(agent, prompt, config=config)
-        return result.output_text.strip()
+
+def _fallback_smart_email(draft_subject: str) -> dict:
+    return {
+        "subjects": [draft_subject, draft_subject, draft_subject],
+        "tone": "formal"
+    }
+
+async def _stream_agent(agent_spec, prompt):
+    """
+    Yield text deltas from the model as they arrive.
+    """
+    from agents import Runner
+    from openai.types.responses import ResponseTextDeltaEvent
+
+    agent = get_agent(*agent_spec)
+    result = Runner.run_streamed(agent, prompt, run_config=get_run_config(MODEL_SETTINGS))
+    async for event in result.stream_events():
+        if event.type == "raw_response_event" and isinstance(event.data, ResponseTextDeltaEvent):
+            yield event.data.delta
+
+# ----------------- AI Cold Email Generator -----------------
+async def generate_email(company, service_offer):
+    """
+    Generate a cold email using OpenAI API (Agent SDK)
+    """
+    try:
+        prompt = _email_prompt(company, service_offer)
+
+        async def run():
+            from agents import Runner
+
+            agent = get_agent(*EMAIL_WRITER)
+            result = await Runner.run(agent, prompt, run_config=get_run_config(MODEL_SETTINGS))
+            return str(result.final_output).strip()
+
+        # same company + offer -> same prompt; served from cache, concurrent calls coalesced
+        key = make_key(prompt, MODEL_NAME, MODEL_SETTINGS)
+        return await generation_cache.get_or_create(key, run)
+
+    except Exception as e:
+        print(f"[AI Writer] Error generating email: {e}")
+        # Fallback plain template
+        return _fallback_email(company, service_offer)
+
+async def stream_email(company, service_offer):
+    """
+    Streaming generate_email: yields text chunks as the model writes them.
+    Cached emails come back as one chunk; on error the fallback template is
+    yielded instead (if nothing was streamed yet).
+    """
+    prompt = _email_prompt(company, service_offer)
+    key = make_key(prompt, MODEL_NAME, MODEL_SETTINGS)
+    cached = generation_cache.peek(key)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    try:
+        async for delta in _stream_agent(EMAIL_WRITER, prompt):
+            chunks.append(delta)
+            yield delta
+        generation_cache.store(key, "".join(chunks).strip())
+    except Exception as e:
+        print(f"[AI Writer] Error streaming email: {e}")
+        if not chunks:
+            yield _fallback_email(company, service_offer)
+
+# ----------------- AI Smart Email (Subject Hooks + Tone) -----------------
+async def generate_smart_email(draft_subject: str, draft_body: str, recipient: str):
+    """
+    Returns 3 subject line suggestions and tone recommendation
+    """
+    try:
+        from agents import Runner
+
+        prompt = _smart_email_prompt(draft_subject, draft_body, recipient)
+        agent = get_agent(*SMART_EMAIL_GENERATOR)
+        result = await Runner.run(agent, prompt, run_config=get_run_config(MODEL_SETTINGS))
+        return str(result.final_output).strip()
     except Exception as e:
         print(f"[AI Writer] Error generating smart email: {e}")
-        return {
-            "subjects": [draft_subject, draft_subject, draft_subject],
-            "tone": "formal"
-        }
+        return _fallback_smart_email(draft_subject)
+
+async def stream_smart_email(draft_subject: str, draft_body: str, recipient: str):
+    """
+    Streaming generate_smart_email. On error yields the fallback dict as JSON text.
+    """
+    streamed = False
+    try:
+        prompt = _smart_email_prompt(draft_subject, draft_body, recipient)
+        async for delta in _stream_agent(SMART_EMAIL_GENERATOR, prompt):
+            streamed = True
+            yield delta
+    except Exception as e:
+        print(f"[AI Writer] Error streaming smart email: {e}")
+        if not streamed:
+            yield json.dumps(_fallback_smart_email(draft_subject))
 
 # ----------------- Lead Scoring -----------------
 async def score_lead(lead: dict) -> float:
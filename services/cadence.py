@@ -0,0 +1,199 @@
+# services/cadence.py
+import os
+import time
+import heapq
+import sqlite3
+import threading
+
+CADENCE_DB = "cadence.db"
+CADENCE_TICK_SECONDS = int(os.getenv("CADENCE_TICK_SECONDS", "60"))
+CADENCE_MAX_PER_TICK = int(os.getenv("CADENCE_MAX_PER_TICK", "200"))
+CADENCE_RETRY_SECONDS = 3600  # failed touches are retried an hour later
+DAY = 86400
+
+# Touch offsets in days from enrollment
+CADENCES = {
+    "default": [0, 3, 7],
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS enrollments (
+    lead_id INTEGER PRIMARY KEY,
+    cadence TEXT NOT NULL,
+    step INTEGER NOT NULL DEFAULT 0,
+    enrolled_at REAL NOT NULL,
+    next_touch REAL,
+    last_touch REAL,
+    status TEXT NOT NULL DEFAULT 'active'
+);
+CREATE INDEX IF NOT EXISTS idx_enrollments_due ON enrollments(status, next_touch);
+"""
+
+
+class CadenceScheduler:
+    """
+    Multi-step follow-up cadences. Enrollments live in SQLite so they
+    survive restarts; active ones are mirrored in a heap ordered by
+    next-touch time, so a tick only pops the leads that are due.
+
+    `touch(due)` is called with [(lead_id, step, enrolled_at)] and returns a dict of
+    lead_id -> "sent" | "failed" | "stop".
+    """
+
+    def __init__(self, touch, path: str = CADENCE_DB):
+        self.touch = touch
+        self.path = path
+        self._lock = threading.Lock()
+        self._tick_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._heap = []
+        self._scheduler = None
+        self._load_heap()
+
+    def _load_heap(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT next_touch, lead_id FROM enrollments WHERE status = 'active'"
+            ).fetchall()
+            self._heap = [(r["next_touch"], r["lead_id"]) for r in rows]
+            heapq.heapify(self._heap)
+
+    # ----------------- Enrollment -----------------
+    def enroll(self, lead_ids: list, cadence: str = "default", start: float | None = None) -> int:
+        """
+        Put leads on a cadence; leads already on an active cadence are left alone.
+        """
+        if cadence not in CADENCES:
+            raise ValueError(f"Unknown cadence: {cadence}")
+        start = start or time.time()
+        first = start + CADENCES[cadence][0] * DAY
+        with self._lock, self._conn:
+            active = {
+                r["lead_id"] for r in self._conn.execute(
+                    "SELECT lead_id FROM enrollments WHERE status = 'active'"
+                )
+            }
+            fresh = [i for i in dict.fromkeys(lead_ids) if i not in active]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO enrollments (lead_id, cadence, step, enrolled_at, next_touch, status) "
+                "VALUES (?, ?, 0, ?, ?, 'active')",
+                [(lead_id, cadence, start, first) for lead_id in fresh],
+            )
+            for lead_id in fresh:
+                heapq.heappush(self._heap, (first, lead_id))
+        return len(fresh)
+
+    def stop(self, lead_id: int) -> bool:
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "UPDATE enrollments SET status = 'stopped', next_touch = NULL "
+                "WHERE lead_id = ? AND status = 'active'",
+                (lead_id,),
+            )
+        # its heap entry is dropped lazily when it comes due
+        return cur.rowcount > 0
+
+    def status(self) -> dict:
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM enrollments GROUP BY status"
+            ).fetchall())
+            next_due = self._heap[0][0] if self._heap else None
+        return {"counts": counts, "queued": len(self._heap), "next_touch": next_due}
+
+    # ----------------- Ticks -----------------
+    def _pop_due(self, now: float) -> list:
+        """
+        Pop due heap entries and keep those that still match the table
+        (stopped / rescheduled leads leave stale entries behind).
+        """
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now and len(due) < CADENCE_MAX_PER_TICK:
+                next_touch, lead_id = heapq.heappop(self._heap)
+                row = self._conn.execute(
+                    "SELECT step, enrolled_at, next_touch, status FROM enrollments WHERE lead_id = ?",
+                    (lead_id,),
+                ).fetchone()
+                if row and row["status"] == "active" and row["next_touch"] == next_touch:
+                    due.append((lead_id, row["step"], row["enrolled_at"]))
+        return due
+
+    def _advance(self, outcomes: dict, now: float):
+        updates, pushes = [], []
+        with self._lock:
+            for lead_id, outcome in outcomes.items():
+                row = self._conn.execute(
+                    "SELECT cadence, step, enrolled_at FROM enrollments WHERE lead_id = ?", (lead_id,)
+                ).fetchone()
+                if not row:
+                    continue
+                offsets = CADENCES.get(row["cadence"], CADENCES["default"])
+                if outcome == "stop":
+                    updates.append(("stopped", row["step"], None, None, lead_id))
+                elif outcome == "failed":
+                    retry = now + CADENCE_RETRY_SECONDS
+                    updates.append(("active", row["step"], retry, None, lead_id))
+                    pushes.append((retry, lead_id))
+                elif row["step"] + 1 >= len(offsets):
+                    updates.append(("done", row["step"] + 1, None, now, lead_id))
+                else:
+                    step = row["step"] + 1
+                    next_touch = max(now, row["enrolled_at"] + offsets[step] * DAY)
+                    updates.append(("active", step, next_touch, now, lead_id))
+                    pushes.append((next_touch, lead_id))
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE enrollments SET status = ?, step = ?, next_touch = ?, "
+                    "last_touch = COALESCE(?, last_touch) WHERE lead_id = ?",
+                    updates,
+                )
+            for entry in pushes:
+                heapq.heappush(self._heap, entry)
+
+    def tick(self, now: float | None = None) -> int:
+        """
+        Touch every due lead once. Returns the number of leads handled.
+        """
+        if not self._tick_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = now or time.time()
+            due = self._pop_due(now)
+            if not due:
+                return 0
+            try:
+                outcomes = self.touch(due)
+            except Exception as e:
+                print(f"[Cadence] Touch of {len(due)} leads failed: {e}")
+                outcomes = {}
+            # anything the handler didn't report on is retried later
+            outcomes = {lead_id: outcomes.get(lead_id, "failed") for lead_id, _, _ in due}
+            self._advance(outcomes, now)
+            return len(due)
+        finally:
+            self._tick_lock.release()
+
+    def start(self, interval: int = CADENCE_TICK_SECONDS):
+        """
+        Run tick() on an APScheduler interval job. The job itself holds no
+        state, so it is simply re-created on every start.
+        """
+        if self._scheduler is not None:
+            return
+        from apscheduler.schedulers.background import BackgroundScheduler
+
+        self._scheduler = BackgroundScheduler(daemon=True)
+        self._scheduler.add_job(
+            self.tick, "interval", seconds=interval, id="cadence-tick",
+            replace_existing=True, max_instances=1, coalesce=True,
+        )
+        self._scheduler.start()
+
+    def shutdown(self):
+        if self._scheduler is not None:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
@@ -0,0 +1,181 @@
+# services/deliverability_model.py
+"""
+Hashed-feature logistic regression for inbox prediction.
+
+Train offline from the sent/reply history:
+
+    python -m services.deliverability_model
+
+A sent email counts as a positive example when its thread got a reply.
+The weights are saved as one compressed NumPy file and loaded once at startup.
+
+The raw output is P(reply), which sits around the base reply rate (a few
+percent), so it is not comparable to the heuristic's 0-1 score. Training
+therefore also stores where the training emails' own scores fall, and
+calibrate() maps a raw probability onto the heuristic's scale:
+
+- below the SPAM_QUANTILE of training scores   -> under 0.4 ("Spam")
+- up to the INBOX_QUANTILE                     -> 0.4-0.7 ("Promotions")
+- above it                                     -> over 0.7 ("Inbox")
+
+So in model mode "Spam" means "less likely to get a reply than 90% of
+what we have sent", not a measured spam-folder placement.
+"""
+import os
+import re
+import zlib
+import numpy as np
+
+MODEL_FILE = os.getenv("DELIVERABILITY_MODEL", "deliverability_model.npz")
+N_FEATURES = 2 ** 16  # hashed feature space; weights are float32 -> 256 KB
+# Stores read for training; the paths mirror services/email_storage.py and
+# the /replies API in main.py, which own (and write) them.
+SENT_STORE = ("sent_emails.snapshot.jsonl", "sent_emails.journal.jsonl")
+INBOX_REPLIES_STORE = ("replies.snapshot.jsonl", "replies.journal.jsonl")
+REPLIES_STORE = ("data/replies.snapshot.jsonl", "data/replies.journal.jsonl")
+SPAM_QUANTILE = float(os.getenv("DELIVERABILITY_SPAM_QUANTILE", "0.1"))
+INBOX_QUANTILE = float(os.getenv("DELIVERABILITY_INBOX_QUANTILE", "0.5"))
+VERDICT_SCALE = (0.0, 0.4, 0.7, 1.0)  # inbox_predictor's Spam / Promotions / Inbox cut points
+
+_TOKEN = re.compile(r"[a-z0-9$%!']+")
+
+
+def feature_ids(subject: str, body: str, n_features: int = N_FEATURES) -> np.ndarray:
+    """
+    Hashed unigram + bigram ids for one email. Subject tokens are hashed
+    apart from body tokens. crc32 keeps ids stable across processes.
+    """
+    ids = []
+    for field, text in (("s", subject), ("b", body)):
+        tokens = _TOKEN.findall((text or "").lower())
+        grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        ids.extend(zlib.crc32(f"{field}:{g}".encode()) % n_features for g in grams)
+    return np.unique(np.asarray(ids, dtype=np.int64))
+
+
+class DeliverabilityModel:
+    def __init__(self, weights: np.ndarray, bias: float, cutoffs: np.ndarray | None = None):
+        self.weights = weights.astype(np.float32)
+        self.bias = float(bias)
+        self.n_features = len(weights)
+        # raw probabilities that map onto VERDICT_SCALE, see calibrate()
+        self.cutoffs = None if cutoffs is None else np.asarray(cutoffs, dtype=np.float64)
+
+    @classmethod
+    def load(cls, path: str = MODEL_FILE):
+        with np.load(path) as data:
+            cutoffs = data["cutoffs"] if "cutoffs" in data.files else None
+            return cls(data["weights"], float(data["bias"]), cutoffs)
+
+    def save(self, path: str = MODEL_FILE):
+        extra = {} if self.cutoffs is None else {"cutoffs": self.cutoffs}
+        np.savez_compressed(path, weights=self.weights, bias=np.float32(self.bias), **extra)
+
+    def fit_cutoffs(self, scores: np.ndarray):
+        """
+        Place the Spam / Inbox cut points at quantiles of the training scores.
+        """
+        spam, inbox = np.quantile(scores, [SPAM_QUANTILE, INBOX_QUANTILE])
+        spam = min(max(spam, 1e-9), 1.0 - 2e-9)
+        inbox = min(max(inbox, spam + 1e-9), 1.0 - 1e-9)
+        self.cutoffs = np.array([0.0, spam, inbox, 1.0])
+
+    def calibrate(self, proba):
+        """
+        Map raw P(reply) onto the heuristic's 0-1 verdict scale, piecewise
+        linearly between the cut points.
+        """
+        return np.interp(proba, self.cutoffs, VERDICT_SCALE)
+
+    def predict_proba(self, subject: str, body: str) -> float:
+        ids = feature_ids(subject, body, self.n_features)
+        z = self.weights[ids].sum() + self.bias
+        return float(1.0 / (1.0 + np.exp(-z)))
+
+    def predict_many(self, emails) -> np.ndarray:
+        """
+        Probabilities for many (subject, body) pairs with one gather + reduceat.
+        """
+        rows = [feature_ids(s, b, self.n_features) for s, b in emails]
+        if not rows:
+            return np.zeros(0, dtype=np.float32)
+        lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+        flat = np.concatenate(rows)
+        sums = np.zeros(len(rows), dtype=np.float32)
+        nonempty = lengths > 0
+        if flat.size:
+            starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))[nonempty]
+            sums[nonempty] = np.add.reduceat(self.weights[flat], starts)
+        return 1.0 / (1.0 + np.exp(-(sums + self.bias)))
+
+
+# ----------------- Training -----------------
+def train(emails, labels, n_features: int = N_FEATURES, epochs: int = 20,
+          lr: float = 0.5, l2: float = 1e-4, seed: int = 0) -> DeliverabilityModel:
+    """
+    Fit logistic regression on binary hashed features with mini-batch
+    gradient descent. `emails` are (subject, body) pairs, `labels` 0/1.
+    """
+    rows = [feature_ids(s, b, n_features) for s, b in emails]
+    y = np.asarray(labels, dtype=np.float32)
+    weights = np.zeros(n_features, dtype=np.float32)
+    bias = float(np.log((y.mean() + 1e-3) / (1 - y.mean() + 1e-3))) if len(y) else 0.0
+    rng = np.random.default_rng(seed)
+
+    for _ in range(epochs):
+        for batch in np.array_split(rng.permutation(len(rows)), max(1, len(rows) // 64)):
+            if not len(batch):
+                continue
+            feats = [rows[i] for i in batch]
+            lengths = np.fromiter((len(f) for f in feats), dtype=np.int64, count=len(feats))
+            flat = np.concatenate(feats)
+            owner = np.repeat(np.arange(len(batch)), lengths)
+            z = np.bincount(owner, weights=weights[flat], minlength=len(batch)) + bias
+            err = (1.0 / (1.0 + np.exp(-z)) - y[batch]).astype(np.float32)
+            grad = np.zeros(n_features, dtype=np.float32)
+            np.add.at(grad, flat, err[owner])
+            weights -= lr * (grad / len(batch) + l2 * weights)
+            bias -= lr * float(err.mean())
+
+    model = DeliverabilityModel(weights, bias)
+    if len(rows):
+        model.fit_cutoffs(model.predict_many(emails))
+    return model
+
+
+def _read_store(paths):
+    """
+    Records of a journal store owned by the running server, read without
+    touching its files (no torn-tail truncation, no new journal).
+    """
+    from services.journal import Journal
+
+    if not any(os.path.exists(p) for p in paths):
+        return
+    for _, record in Journal(*paths).iter_records_readonly():
+        yield record
+
+
+def training_set():
+    """
+    (subject, body) pairs and reply labels from the sent-email and reply stores.
+    """
+    replied_threads = {r.get("threadId") for r in _read_store(INBOX_REPLIES_STORE)}
+    replied_threads.update(r.get("threadId") for r in _read_store(REPLIES_STORE))
+    replied_threads.discard(None)
+
+    emails, labels = [], []
+    for email in _read_store(SENT_STORE):
+        emails.append((email.get("subject", ""), email.get("body", "")))
+        labels.append(1 if email.get("replies") or email.get("threadId") in replied_threads else 0)
+    return emails, labels
+
+
+if __name__ == "__main__":
+    emails, labels = training_set()
+    if not emails or len(set(labels)) < 2:
+        raise SystemExit(f"Need replied and unreplied sent emails to train (got {len(emails)} emails).")
+    model = train(emails, labels)
+    model.save()
+    print(f"[Deliverability] Trained on {len(emails)} emails ({sum(labels)} replied) -> {MODEL_FILE}")
+    print(f"[Deliverability] Spam below P(reply) {model.cutoffs[1]:.4f}, Inbox above {model.cutoffs[2]:.4f}")
@@ -66,21 +66,12 @@ def get_latest_replies():
         raise HTTPException(status_code=500, detail=str(e))
 
 from fastapi import APIRouter, HTTPException
-import os, json
 
 router = APIRouter()
 
-STORAGE_FILE = "sent_emails.json"
-
-def load_emails():
-    if os.path.exists(STORAGE_FILE):
-        with open(STORAGE_FILE, "r") as f:
-            return json.load(f)
-    return []
-
-def save_emails(data):
-    with open(STORAGE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+# sent emails live in the email_storage journal, not in a raw JSON file
+load_emails = email_storage.load_emails
+save_emails = email_storage.save_emails
 
 @router.get("/emails")
 def get_emails():
@@ -88,9 +79,6 @@ def get_emails():
 
 @router.delete("/emails/{thread_id}")
 def delete_email(thread_id: str):
-    emails = load_emails()
-    new_emails = [e for e in emails if e["threadId"] != thread_id]
-    if len(emails) == len(new_emails):
+    if not email_storage.delete_thread(thread_id):
         raise HTTPException(status_code=404, detail="Email not found")
-    save_emails(new_emails)
     return {"message": "Deleted successfully"}
@@ -0,0 +1,134 @@
+# services/email_index.py
+import sqlite3
+import threading
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    seq INTEGER PRIMARY KEY,
+    email_id TEXT,
+    thread_id TEXT,
+    source TEXT NOT NULL,
+    byte_offset INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_records_email_id ON records(email_id);
+CREATE INDEX IF NOT EXISTS idx_records_thread_id ON records(thread_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+CREATE TABLE IF NOT EXISTS reply_ids (message_id TEXT PRIMARY KEY, seq INTEGER NOT NULL);
+"""
+
+
+class EmailIndex:
+    """
+    Persistent secondary index for a Journal: sent-email `id` and `threadId`
+    -> journal seq -> (file, byte offset) of the record line.
+
+    The Journal calls added/deleted/rebuilt on every write, so lookups never
+    need to load the store. It also remembers the Gmail message id of every
+    reply pushed onto a record (`messageId`), so a reply is stored once.
+    """
+
+    def __init__(self, path: str, id_field: str = "id", thread_field: str = "threadId"):
+        self.path = path
+        self.id_field = id_field
+        self.thread_field = thread_field
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+
+    def _rows(self, items):
+        return [
+            (seq, record.get(self.id_field), record.get(self.thread_field), source, offset)
+            for seq, record, (source, offset) in items
+        ]
+
+    def _set_max_seq(self, max_seq: int):
+        self._conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('max_seq', ?) "
+            "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+            (max_seq,),
+        )
+
+    # ----------------- Journal hooks -----------------
+    def added(self, items: list):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?)", self._rows(items)
+            )
+            self._set_max_seq(max(seq for seq, _, _ in items))
+
+    def deleted(self, seqs: list):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM records WHERE seq = ?", [(s,) for s in seqs])
+            self._conn.executemany("DELETE FROM reply_ids WHERE seq = ?", [(s,) for s in seqs])
+
+    def rebuilt(self, items: list, max_seq: int):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM records")
+            self._conn.executemany(
+                "INSERT INTO records VALUES (?, ?, ?, ?, ?)", self._rows(items)
+            )
+            self._conn.execute("DELETE FROM meta WHERE key = 'max_seq'")
+            self._set_max_seq(max_seq)
+            self._conn.execute("DELETE FROM reply_ids")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO reply_ids VALUES (?, ?)",
+                [
+                    (reply["messageId"], seq)
+                    for seq, record, _ in items
+                    for reply in record.get("replies") or ()
+                    if isinstance(reply, dict) and reply.get("messageId")
+                ],
+            )
+
+    def replies_added(self, items: list):
+        """
+        (message_id, seq) pairs of replies pushed onto records.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO reply_ids VALUES (?, ?)", items)
+
+    # ----------------- Lookups -----------------
+    def max_seq(self) -> int:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'max_seq'").fetchone()
+        return row[0] if row else 0
+
+    def has_reply(self, message_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM reply_ids WHERE message_id = ?", (message_id,)
+            ).fetchone()
+        return row is not None
+
+    def seq_for_id(self, email_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT seq FROM records WHERE email_id = ? LIMIT 1", (email_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def seqs_for_thread(self, thread_id: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT seq FROM records WHERE thread_id = ? ORDER BY seq", (thread_id,)
+            ).fetchall()
+        return [r[0] for r in rows]
+
+    def location(self, seq: int):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, byte_offset FROM records WHERE seq = ?", (seq,)
+            ).fetchone()
+        return tuple(row) if row else None
+
+    def first_location_after(self, seq: int):
+        """
+        (source, offset) of the first live record after `seq`, for seeking
+        to a pagination cursor. None when there is none.
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source, byte_offset FROM records WHERE seq > ? ORDER BY seq LIMIT 1", (seq,)
+            ).fetchone()
+        return tuple(row) if row else None
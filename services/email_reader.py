@@ -3,6 +3,7 @@ from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 import base64
 import email
+from services.gmail_batch import fetch_messages
 
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly']
 
@@ -16,8 +17,7 @@ def get_replies():
     messages = results.get('messages', [])
 
     replies = []
-    for msg in messages:
-        msg_data = service.users().messages().get(userId='me', id=msg['id'], format='full').execute()
+    for msg_data in fetch_messages(service, [m['id'] for m in messages], format='full'):
         headers = msg_data['payload']['headers']
         subject = next((h['value'] for h in headers if h['name'] == 'Subject'), 'No Subject')
         from_email = next((h['value'] for h in headers if h['name'] == 'From'), 'Unknown')
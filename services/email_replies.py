@@ -1,5 +1,7 @@
 from services.gmail_auth import get_gmail_service
 from services import email_storage
+from services.gmail_batch import fetch_messages_checked
+from services import inbox_sync
 from datetime import datetime
 import base64
 from email.mime.text import MIMEText
@@ -7,14 +9,11 @@ import re
 
 def fetch_replies():
     service = get_gmail_service()
-    results = service.users().messages().list(
-        userId="me",
-        q="in:inbox newer_than:30d"  # fetch inbox replies in last 30 days
-    ).execute()
+    # only messages added since the last sync (full 30-day resync if the cursor expired)
+    message_ids, cursor = inbox_sync.changed_message_ids(service)
+    messages, failed = fetch_messages_checked(service, message_ids)
 
-    messages = results.get("messages", [])
-    for msg in messages:
-        msg_data = service.users().messages().get(userId="me", id=msg["id"]).execute()
+    for msg_data in messages:
         headers = msg_data.get("payload", {}).get("headers", [])
         
         subject = next((h["value"] for h in headers if h["name"] == "Subject"), "")
@@ -31,9 +30,17 @@ def fetch_replies():
         sent_id = match.group(1) if match else None
         
         if sent_id:
+            # keyed on the Gmail message id, so resyncs don't store it twice
             email_storage.save_reply(sent_id, {
+                "messageId": msg_data.get("id"),
                 "from": from_email,
                 "subject": subject,
                 "body": body_data,
                 "date": date
             })
+
+    # messages that still failed after retrying are carried over to the next sync
+    if failed:
+        print(f"[Replies] {len(failed)} messages left for the next sync")
+    if cursor:
+        inbox_sync.save_cursor(cursor, pending=failed)
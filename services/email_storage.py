@@ -23,61 +23,117 @@
 #     return []
 
 
-import json
-import os
+from services.journal import Journal
+from services.email_index import EmailIndex
 
-STORAGE_FILE = "sent_emails.json"
+STORAGE_FILE = "sent_emails.json"  # legacy JSON array, imported once
+SNAPSHOT_FILE = "sent_emails.snapshot.jsonl"
+JOURNAL_FILE = "sent_emails.journal.jsonl"
+INDEX_FILE = "sent_emails.index.db"
 
-def save_email(entry):
-    if os.path.exists(STORAGE_FILE):
-        with open(STORAGE_FILE, "r") as f:
-            data = json.load(f)
-    else:
-        data = []
+_index = EmailIndex(INDEX_FILE)
+_sent = Journal(SNAPSHOT_FILE, JOURNAL_FILE, legacy_path=STORAGE_FILE, index=_index)
+_sent.load()
 
+def save_email(entry):
     # Ensure reply field exists
     entry.setdefault("replies", [])
-    data.append(entry)
-
-    with open(STORAGE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+    _sent.add(entry)
 
-def save_reply(sent_email_id, reply_entry):
-    if os.path.exists(STORAGE_FILE):
-        with open(STORAGE_FILE, "r") as f:
-            data = json.load(f)
-    else:
-        data = []
+def save_emails_batch(entries):
+    """
+    Record many sent emails with a single journal write.
+    """
+    for entry in entries:
+        entry.setdefault("replies", [])
+    _sent.add_many(entries)
 
-    for email in data:
-        if email.get("id") == sent_email_id:
-            email.setdefault("replies", []).append(reply_entry)
-            break
+def has_email(email_id):
+    return _index.seq_for_id(email_id) is not None
 
-    with open(STORAGE_FILE, "w") as f:
-        json.dump(data, f, indent=4)
+def save_reply(sent_email_id, reply_entry) -> bool:
+    """
+    Attach a reply to a sent email. Replies carrying a Gmail `messageId`
+    are stored once, however often a sync sees them. Returns True if stored.
+    """
+    seq = _index.seq_for_id(sent_email_id)
+    if seq is None:
+        return False
+    message_id = reply_entry.get("messageId")
+    if message_id and _index.has_reply(message_id):
+        return False
+    _sent.push(seq, "replies", reply_entry)
+    if message_id:
+        _index.replies_added([(message_id, seq)])
+    return True
+
+def get_email_by_thread(thread_id):
+    for seq in _index.seqs_for_thread(thread_id):
+        location = _index.location(seq)
+        email = _sent.read(seq, location) if location else None
+        if email is not None:
+            return seq, email
+    return None, None
+
+def set_tags(thread_id, tags):
+    """
+    Tag the first email of a thread. Returns the updated email or None.
+    """
+    seq, email = get_email_by_thread(thread_id)
+    if email is None:
+        return None
+    _sent.patch(seq, {"tags": tags})
+    email["tags"] = tags
+    return email
+
+def delete_thread(thread_id) -> int:
+    """
+    Delete every sent email of a thread. Returns how many were removed.
+    """
+    seqs = _index.seqs_for_thread(thread_id)
+    for seq in seqs:
+        _sent.delete(seq)
+    return len(seqs)
 
 def load_emails():
-    if os.path.exists(STORAGE_FILE):
-        with open(STORAGE_FILE, "r") as f:
-            return json.load(f)
-    return []
+    return _sent.records()
+
+def iter_emails(after: int | None = None):
+    """
+    Stream (seq, email) pairs in send order; seq is a stable cursor key.
+    `after` seeks past a cursor through the index instead of rescanning.
+    """
+    return _sent.iter_records(after)
+
+def save_emails(data):
+    _sent.rewrite(data)
 
 
-import os
-import pickle
+REPLIES_FILE = "replies.pkl"  # legacy pickled list, imported once
+REPLIES_SNAPSHOT_FILE = "replies.snapshot.jsonl"
+REPLIES_JOURNAL_FILE = "replies.journal.jsonl"
+REPLIES_INDEX_FILE = "replies.index.db"
 
-REPLIES_FILE = "replies.pkl"
+_replies_index = EmailIndex(REPLIES_INDEX_FILE)
+_replies = Journal(REPLIES_SNAPSHOT_FILE, REPLIES_JOURNAL_FILE,
+                   legacy_path=REPLIES_FILE, index=_replies_index)
+_replies.load()
 
 def save_replies(replies: list):
-    with open(REPLIES_FILE, "wb") as f:
-        pickle.dump(replies, f)
+    _replies.rewrite(replies)
+
+def add_reply(reply: dict) -> int:
+    return _replies.add(reply)
 
 def load_replies():
-    if os.path.exists(REPLIES_FILE):
-        with open(REPLIES_FILE, "rb") as f:
-            return pickle.load(f)
-    return []
+    return _replies.records()
+
+def iter_replies(after: int | None = None):
+    """
+    Stream (seq, reply) pairs; seqs continue the positions of replies.pkl,
+    so old cursors stay valid.
+    """
+    return _replies.iter_records(after)
 
 # ✅ Fix: implement this missing function
 def load_new_replies(thread_ids: list):
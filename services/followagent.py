@@ -1,39 +1,142 @@
 import os
-from dotenv import load_dotenv
-from agents import Agent, OpenAIChatCompletionsModel, Runner
-from agents.run import RunConfig
-from openai import AsyncOpenAI
-
-load_dotenv()
-
-openai_api = os.getenv("OPENAI_API_KEY")
-client = AsyncOpenAI(api_key=openai_api)
-
-model = OpenAIChatCompletionsModel(
-    model="gpt-4o-mini",
-    openai_client=client
-)
-
-config = RunConfig(
-    model=model,
-    model_provider=client,
-    tracing_disabled=True,
-    model_settings={
-        "temperature": 0.7,
-        "max_tokens": 400,
-        "top_p": 0.9,
-    }
-)
-
-async def generate_followup(name: str, company: str | None = None) -> str:
-    prompt = f"""
-    Write a polite and professional follow-up email to {name} from {company or "our company"}.
+import asyncio
+from pydantic import BaseModel
+from services.agent_registry import MODEL_NAME, get_agent, get_run_config
+from services.gen_cache import generation_cache, make_key
+
+# The OpenAI client is shared with ai_writer and created lazily by agent_registry
+MODEL_SETTINGS = {
+    "temperature": 0.7,
+    "max_tokens": 400,
+    "top_p": 0.9,
+}
+FOLLOWUP_BATCH_SIZE = int(os.getenv("FOLLOWUP_BATCH_SIZE", "8"))  # leads per LLM request
+
+def _followup_prompt(name: str, company: str | None = None, role: str | None = None) -> str:
+    role = f" ({role})" if role else ""
+    return f"""
+    Write a polite and professional follow-up email to {name}{role} from {company or "our company"}.
     Keep it under 100 words.
     """
-    agent = Agent(
-        name="followup-writer",
-        instructions="You are an AI that writes short professional follow-up emails.",
-        model=model,
+
+def _lead_prompt(lead: dict) -> str:
+    return _followup_prompt(lead.get("name") or "there", lead.get("company"), lead.get("role"))
+
+def _cache_key(prompt: str) -> str:
+    return make_key(prompt, MODEL_NAME, MODEL_SETTINGS)
+
+def _fallback_followup(name: str, company: str | None = None) -> str:
+    return (
+        f"Hi {name},\n\n"
+        f"I wanted to follow up on my previous email about how we could help {company or 'your team'}.\n\n"
+        f"Would you be open to a short call this week?\n\n"
+        f"Best regards,\n[Your Name]"
+    )
+
+async def generate_followup(name: str, company: str | None = None, role: str | None = None,
+                            use_cache: bool = True) -> str:
+    """
+    One follow-up email. Served from generation_cache (same name, role and
+    company -> same prompt) unless `use_cache` is off.
+    """
+    prompt = _followup_prompt(name, company, role)
+
+    async def run():
+        from agents import Runner
+
+        agent = get_agent(
+            "followup-writer",
+            "You are an AI that writes short professional follow-up emails.",
+        )
+        result = await Runner.run(agent, prompt, run_config=get_run_config(MODEL_SETTINGS))
+        return str(result.final_output).strip()
+
+    if not use_cache:
+        return await run()
+    return await generation_cache.get_or_create(_cache_key(prompt), run)
+
+# ----------------- Batched follow-ups -----------------
+class FollowupEmail(BaseModel):
+    lead: int
+    body: str
+
+class FollowupBatch(BaseModel):
+    emails: list[FollowupEmail]
+
+def _batch_prompt(leads: list) -> str:
+    lines = []
+    for i, lead in enumerate(leads, 1):
+        name = lead.get("name") or "there"
+        company = lead.get("company") or "our company"
+        role = f", {lead['role']}" if lead.get("role") else ""
+        lines.append(f"{i}. {name}{role} at {company}")
+    return (
+        "Write one polite and professional follow-up email for each lead below.\n"
+        "Keep each email under 100 words and personalise it to the lead.\n"
+        "Return exactly one entry per lead, with `lead` set to the lead's number.\n\n"
+        + "\n".join(lines)
     )
-    result = await Runner.run(agent, prompt)
-    return result.output_text.strip()
+
+async def generate_followup_batch(leads: list) -> list:
+    """
+    Write follow-ups for several leads in one structured-output request.
+    Raises ValueError if the reply does not contain exactly one email per lead.
+    """
+    from agents import Runner
+
+    agent = get_agent(
+        "followup-batch-writer",
+        "You are an AI that writes short professional follow-up emails for a list of leads.",
+        output_type=FollowupBatch,
+    )
+    # the token budget scales with the number of emails asked for
+    settings = {**MODEL_SETTINGS, "max_tokens": MODEL_SETTINGS["max_tokens"] * len(leads)}
+    result = await Runner.run(agent, _batch_prompt(leads), run_config=get_run_config(settings))
+
+    bodies = {e.lead: e.body.strip() for e in result.final_output.emails if e.body.strip()}
+    if sorted(bodies) != list(range(1, len(leads) + 1)):
+        raise ValueError(f"expected {len(leads)} follow-ups, got leads {sorted(bodies)}")
+    return [bodies[i] for i in range(1, len(leads) + 1)]
+
+async def _followup_for_lead(lead: dict, use_cache: bool = True) -> str:
+    """
+    generate_followup for one lead, falling back to a template when the
+    model is unavailable, so this never raises.
+    """
+    name = lead.get("name") or "there"
+    try:
+        return await generate_followup(name, lead.get("company"), lead.get("role"), use_cache)
+    except Exception as e:
+        print(f"[Follow-up] Failed to generate for {lead.get('email')}: {e}")
+        return _fallback_followup(name, lead.get("company"))
+
+async def generate_followups(leads: list, use_cache: bool = True) -> list:
+    """
+    Follow-up bodies for `leads`, in order. Leads already in generation_cache
+    are served from it; the rest are packed into one request whose bodies
+    are cached per lead, under the same key generate_followup uses. A
+    single missing lead, or a batch that fails or doesn't parse, goes
+    through generate_followup per lead. Never raises: a lead whose request
+    fails gets the template email.
+    """
+    keys = [_cache_key(_lead_prompt(lead)) for lead in leads]
+    bodies = [generation_cache.peek(k) if use_cache else None for k in keys]
+    missing = [i for i, body in enumerate(bodies) if body is None]
+
+    if len(missing) > 1:
+        try:
+            generated = await generate_followup_batch([leads[i] for i in missing])
+            if use_cache:
+                generation_cache.count_misses(len(missing))
+            for i, body in zip(missing, generated):
+                bodies[i] = body
+                if use_cache:
+                    generation_cache.store(keys[i], body)
+            missing = []
+        except Exception as e:
+            print(f"[Follow-up] Batch of {len(missing)} failed, generating per lead: {e}")
+
+    generated = await asyncio.gather(*(_followup_for_lead(leads[i], use_cache) for i in missing))
+    for i, body in zip(missing, generated):
+        bodies[i] = body
+    return bodies
@@ -2,18 +2,23 @@
 import base64
 from email.mime.text import MIMEText
 from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
+from services.gmail_auth import cached_service
 
 def send_gmail_email(user_token: dict, to: str, subject: str, body: str):
-    creds = Credentials(
-        token=user_token["access_token"],
-        refresh_token=user_token.get("refresh_token"),
-        token_uri="https://oauth2.googleapis.com/token",
-        client_id=user_token["client_id"],
-        client_secret=user_token["client_secret"],
-        scopes=["https://www.googleapis.com/auth/gmail.send"]
-    )
-    service = build("gmail", "v1", credentials=creds)
+    def make_credentials():
+        return Credentials(
+            token=user_token["access_token"],
+            refresh_token=user_token.get("refresh_token"),
+            token_uri="https://oauth2.googleapis.com/token",
+            client_id=user_token["client_id"],
+            client_secret=user_token["client_secret"],
+            scopes=["https://www.googleapis.com/auth/gmail.send"]
+        )
+
+    # one service per credential (and thread) instead of a discovery build per send
+    key = ("user_token", user_token["client_id"],
+           user_token.get("refresh_token") or user_token["access_token"])
+    service = cached_service(key, make_credentials)
 
     message = MIMEText(body)
     message["to"] = to
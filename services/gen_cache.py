@@ -0,0 +1,166 @@
+# services/gen_cache.py
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+
+GEN_CACHE_SIZE = int(os.getenv("GEN_CACHE_SIZE", "1024"))
+GEN_CACHE_TTL = int(os.getenv("GEN_CACHE_TTL", str(24 * 3600)))  # seconds
+GEN_CACHE_DISK = os.getenv("GEN_CACHE_DISK")  # e.g. "gen_cache.db" to persist across restarts
+
+
+def normalise_prompt(prompt: str) -> str:
+    return re.sub(r"\s+", " ", prompt).strip()
+
+
+def make_key(prompt: str, model: str, settings: dict | None = None) -> str:
+    payload = json.dumps(
+        {"prompt": normalise_prompt(prompt), "model": model, "settings": settings or {}},
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class _DiskTier:
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM generations WHERE key = ?", (key,)
+            ).fetchone()
+        if row and row[1] > time.time():
+            return row
+        return None
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations VALUES (?, ?, ?)", (key, value, expires_at)
+            )
+
+
+class GenerationCache:
+    """
+    LRU + TTL cache for LLM completions with an optional SQLite disk tier.
+    Concurrent requests for the same key (on the same event loop) share a
+    single upstream call. Failures are never cached.
+    """
+
+    def __init__(self, max_entries: int = GEN_CACHE_SIZE, ttl: int = GEN_CACHE_TTL,
+                 disk_path: str | None = GEN_CACHE_DISK):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._disk = _DiskTier(disk_path) if disk_path else None
+        self.hits = self.disk_hits = self.misses = self.coalesced = self.evictions = 0
+
+    def _get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry:
+                del self._entries[key]
+        if self._disk:
+            row = self._disk.get(key)
+            if row:
+                value, expires_at = row
+                self._put(key, value, expires_at)
+                with self._lock:
+                    self.disk_hits += 1
+                return value
+        return None
+
+    def _put(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def peek(self, key: str):
+        """
+        Cached value for `key` or None, without starting a generation.
+        """
+        return self._get(key)
+
+    def count_misses(self, n: int = 1):
+        """
+        Record generations made outside get_or_create (e.g. a batched request
+        whose results are stored per key) so stats() still counts them.
+        """
+        with self._lock:
+            self.misses += n
+
+    def store(self, key: str, value: str):
+        """
+        Cache a value produced outside get_or_create (e.g. a finished stream).
+        """
+        expires_at = time.time() + self.ttl
+        self._put(key, value, expires_at)
+        if self._disk:
+            self._disk.set(key, value, expires_at)
+
+    async def get_or_create(self, key: str, factory):
+        """
+        Return the cached value for `key`, or await `factory()` once and cache it.
+        """
+        value = self._get(key)
+        if value is not None:
+            return value
+
+        loop = asyncio.get_running_loop()
+        pending = self._inflight.get((id(loop), key))
+        if pending is not None:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = loop.create_future()
+        self._inflight[(id(loop), key)] = future
+        with self._lock:
+            self.misses += 1
+        try:
+            value = await factory()
+            self.store(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody else was waiting
+            raise
+        finally:
+            self._inflight.pop((id(loop), key), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses + self.coalesced
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_rate": round((lookups - self.misses) / lookups, 3) if lookups else 0.0,
+            }
+
+
+generation_cache = GenerationCache()
@@ -47,7 +47,10 @@
 # services/gmail_auth.py
 import os
 import pickle
-from google.oauth2.credentials import Credentials
+import threading
+import time
+from datetime import datetime, timedelta
+from google.auth.transport.requests import Request
 from googleapiclient.discovery import build
 
 TOKEN_PATH = "token.pkl"
@@ -57,23 +60,110 @@ SCOPES = [
     "https://www.googleapis.com/auth/gmail.send",
 ]
 
+REFRESH_MARGIN = timedelta(minutes=5)  # refresh this long before the token expires
+REFRESH_CHECK_SECONDS = 60
+
+# ----------------- Client cache -----------------
+# Credentials are loaded from token.pkl once per login. Service objects wrap an
+# httplib2 connection that is not thread-safe, so each worker thread keeps its
+# own, keyed by credential identity + login generation.
+_lock = threading.Lock()
+_creds = None
+_generation = 0
+_local = threading.local()
+_refresher = None
+
+
+def _credentials_key(creds):
+    return (
+        getattr(creds, "client_id", None),
+        getattr(creds, "refresh_token", None) or getattr(creds, "token", None),
+    )
+
+
+def cached_service(key, make_credentials):
+    """
+    Return this thread's Gmail service for `key`, building it (discovery
+    parse included) only the first time the key is seen on this thread.
+    """
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+    service = services.get(key)
+    if service is None:
+        service = build("gmail", "v1", credentials=make_credentials(), cache_discovery=False)
+        services[key] = service
+    return service
+
+
+def _save_credentials(creds):
+    with open(TOKEN_PATH, "wb") as f:
+        pickle.dump(creds, f)
+
+
+def _refresh_loop():
+    while True:
+        time.sleep(REFRESH_CHECK_SECONDS)
+        with _lock:
+            creds = _creds
+        if creds is None or not getattr(creds, "refresh_token", None):
+            continue
+        expiry = getattr(creds, "expiry", None)
+        if expiry and expiry - datetime.utcnow() > REFRESH_MARGIN:
+            continue
+        try:
+            creds.refresh(Request())
+            with _lock:
+                if creds is _creds:
+                    _save_credentials(creds)
+        except Exception as e:
+            print("Failed to refresh Gmail token:", e)
+
+
+def _start_refresher():
+    global _refresher
+    if _refresher is None:
+        _refresher = threading.Thread(target=_refresh_loop, name="gmail-token-refresh", daemon=True)
+        _refresher.start()
+
+
+def get_credentials():
+    """
+    Cached Credentials from token.pkl, or None when not logged in.
+    """
+    global _creds
+    with _lock:
+        if _creds is None:
+            if not os.path.exists(TOKEN_PATH):
+                return None
+            with open(TOKEN_PATH, "rb") as f:
+                _creds = pickle.load(f)
+            _start_refresher()
+        return _creds
+
+
+def invalidate_gmail_service():
+    """
+    Drop the cached credentials/services (call on logout and after a new login).
+    """
+    global _creds, _generation
+    with _lock:
+        _creds = None
+        _generation += 1
+
+
 def get_gmail_service():
     """
     Return googleapiclient service or None if token not present/expired.
     """
-    if not os.path.exists(TOKEN_PATH):
-        return None
     try:
-        with open(TOKEN_PATH, "rb") as f:
-            creds = pickle.load(f)
-        # creds may be google.oauth2.credentials.Credentials or oauthlib creds—handle both
-        if isinstance(creds, Credentials):
-            credentials = creds
-        else:
-            # if stored from google_auth_oauthlib.flow, it might be google.oauth2.credentials.Credentials pickled
-            credentials = creds
-        service = build("gmail", "v1", credentials=credentials)
-        return service
+        creds = get_credentials()
+        if creds is None:
+            return None
+        # creds may be google.oauth2.credentials.Credentials or oauthlib creds; both
+        # pickle as google.oauth2.credentials.Credentials and work with build()
+        key = (_generation, *_credentials_key(creds))
+        return cached_service(key, lambda: creds)
     except Exception as e:
         print("Failed to load Gmail service:", e)
         return None
@@ -0,0 +1,101 @@
+# services/gmail_batch.py
+import json
+import time
+from googleapiclient.errors import HttpError
+
+BATCH_SIZE = 100  # Gmail accepts up to 100 sub-requests per batch call
+BATCH_RETRIES = 4  # extra rounds for sub-requests that hit 429 / 5xx
+BATCH_BACKOFF_SECONDS = 1.0  # doubled after every round
+
+
+RATE_LIMIT_REASONS = {"rateLimitExceeded", "userRateLimitExceeded"}
+
+
+def _error_reasons(exception: HttpError) -> set:
+    """
+    The `reason` codes of a Gmail error response, e.g. {"userRateLimitExceeded"}.
+    """
+    try:
+        errors = json.loads(exception.content).get("error", {}).get("errors", [])
+    except (ValueError, TypeError, AttributeError):
+        return set()
+    return {e.get("reason") for e in errors if isinstance(e, dict)}
+
+
+def _retryable(exception) -> bool:
+    """
+    Rate limits (429, and 403s whose reason is a rate limit) and server
+    errors are worth retrying; other HTTP errors, including permission
+    403s, will fail the same way again. Transport errors without a status
+    are retried too.
+    """
+    if isinstance(exception, HttpError):
+        status = exception.resp.status
+        if status == 403:
+            return bool(_error_reasons(exception) & RATE_LIMIT_REASONS)
+        return status == 429 or status >= 500
+    return True
+
+
+def _gone(exception) -> bool:
+    # deleted between listing and fetching; there is nothing left to load
+    return isinstance(exception, HttpError) and exception.resp.status in (404, 410)
+
+
+def fetch_messages_checked(service, message_ids: list, **get_kwargs) -> tuple:
+    """
+    Fetch many messages with Gmail batch HTTP requests instead of one
+    messages().get() round trip each. Sub-requests that fail with a
+    retryable error are sent again in a new batch, with exponential backoff.
+
+    Returns (messages, failed_ids): messages keep the order of
+    `message_ids`; failed_ids could not be loaded even after retrying.
+    Messages that no longer exist are in neither list.
+    """
+    results, errors, failed = {}, {}, {}
+
+    def on_response(request_id, response, exception):
+        if exception is None:
+            results[request_id] = response
+        elif not _gone(exception):
+            errors[request_id] = exception
+
+    todo = list(dict.fromkeys(message_ids))
+    for attempt in range(BATCH_RETRIES + 1):
+        if attempt:
+            print(f"[Gmail Batch] Retrying {len(todo)} messages (attempt {attempt})")
+            time.sleep(BATCH_BACKOFF_SECONDS * 2 ** (attempt - 1))
+        errors.clear()
+        for start in range(0, len(todo), BATCH_SIZE):
+            chunk = todo[start:start + BATCH_SIZE]
+            batch = service.new_batch_http_request(callback=on_response)
+            for msg_id in chunk:
+                batch.add(
+                    service.users().messages().get(userId="me", id=msg_id, **get_kwargs),
+                    request_id=msg_id,
+                )
+            try:
+                batch.execute()
+            except Exception as e:
+                # the batch call itself failed: retry whatever it didn't deliver
+                errors.update((m, e) for m in chunk if m not in results)
+        failed.update((m, e) for m, e in errors.items() if not _retryable(e))
+        todo = [m for m, e in errors.items() if _retryable(e)]
+        if not todo:
+            break
+    failed.update((m, errors[m]) for m in todo)
+
+    for msg_id, exception in failed.items():
+        print(f"[Gmail Batch] Failed to fetch message {msg_id}: {exception}")
+    return (
+        [results[m] for m in message_ids if m in results],
+        [m for m in dict.fromkeys(message_ids) if m in failed],
+    )
+
+
+def fetch_messages(service, message_ids: list, **get_kwargs) -> list:
+    """
+    Best-effort fetch_messages_checked: messages that still fail after
+    retrying are skipped.
+    """
+    return fetch_messages_checked(service, message_ids, **get_kwargs)[0]
@@ -0,0 +1,212 @@
+# services/inbox_predictor.py
+import os
+import re
+import hashlib
+import threading
+
+RISKY_WORDS_FILE = os.getenv("RISKY_WORDS_FILE")  # optional, one word/phrase per line
+
+RISKY_WORDS = [
+    "free", "winner", "buy now", "click here", "limited offer", "discount",
+    "urgent", "prize", "act now", "exclusive deal", "offer expires", "congratulations",
+    "cash bonus", "earn money", "risk-free", "guaranteed", "credit card", "save big",
+    "deal of the day", "special promotion", "claim now", "limited time", "hot offer",
+    "cheap", "amazing", "bonus", "promotion", "investment opportunity", "double your income"
+]
+
+
+def load_risky_words(path: str | None = RISKY_WORDS_FILE) -> list:
+    if path and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            words = [line.strip().lower() for line in f if line.strip() and not line.startswith("#")]
+        if words:
+            return words
+    return list(RISKY_WORDS)
+
+
+class RiskyWordMatcher:
+    """
+    The whole lexicon compiled into one regex and matched in a single scan.
+    Every phrase is tried at every word start through a lookahead, so
+    overlapping hits ("limited offer" / "offer expires") are all found, and
+    phrases that are a word-prefix of a longer hit ride along via a
+    precomputed prefix map.
+    """
+
+    def __init__(self, words: list):
+        self.reload(words)
+
+    def reload(self, words: list):
+        words = list(dict.fromkeys(w.lower() for w in words if w))
+        by_length = sorted(words, key=len, reverse=True)
+        pattern = re.compile(
+            r"\b(?=(" + "|".join(re.escape(w) for w in by_length) + r")\b)"
+        ) if words else None
+        prefixes = {
+            w: [p for p in words if p != w and re.match(re.escape(p) + r"\b", w)]
+            for w in words
+        }
+        rank = {w: i for i, w in enumerate(words)}
+        # swapped in one assignment so concurrent find() calls see a consistent set
+        self._state = (pattern, prefixes, rank)
+
+    def find(self, text: str) -> list:
+        """
+        Lexicon entries present in `text` (lower-cased), in lexicon order.
+        """
+        pattern, prefixes, rank = self._state
+        if pattern is None:
+            return []
+        found = set()
+        for m in pattern.finditer(text):
+            hit = m.group(1)
+            found.add(hit)
+            found.update(prefixes[hit])
+        return sorted(found, key=rank.__getitem__)
+
+
+_reload_lock = threading.Lock()
+risky_matcher = RiskyWordMatcher(load_risky_words())
+
+
+def reload_risky_words(words: list | None = None) -> int:
+    """
+    Recompile the matcher from `words`, or from RISKY_WORDS_FILE / the
+    built-in list. Returns the number of entries loaded.
+    """
+    with _reload_lock:
+        words = words if words is not None else load_risky_words()
+        risky_matcher.reload(words)
+        _verdicts.clear()
+        return len(risky_matcher._state[2])
+
+
+# ----------------- Optional trained model -----------------
+# "heuristic" (default) or "model"; model mode needs a weight file trained
+# with `python -m services.deliverability_model`. Its reply probability is
+# calibrated onto the heuristic's 0-1 scale before the verdict thresholds
+# apply (see the deliverability_model docstring for what the labels mean).
+PREDICT_MODE = os.getenv("PREDICT_MODE", "heuristic")
+_model = None
+_verdicts = {}  # body hash -> prediction, see predict_cached()
+VERDICT_CACHE_SIZE = 4096
+
+
+def load_model(path: str | None = None) -> bool:
+    """
+    Load the deliverability weights once. Returns False (and keeps the
+    heuristic) when no weight file exists.
+    """
+    global _model
+    from services import deliverability_model
+
+    path = path or deliverability_model.MODEL_FILE
+    if not os.path.exists(path):
+        return False
+    try:
+        model = deliverability_model.DeliverabilityModel.load(path)
+        if model.cutoffs is None:
+            print(f"[Inbox Predictor] {path} has no calibration, retrain it; keeping the heuristic")
+            return False
+        _model = model
+        _verdicts.clear()
+        print(f"[Inbox Predictor] Loaded deliverability model from {path}")
+        return True
+    except Exception as e:
+        print(f"[Inbox Predictor] Could not load {path}: {e}")
+        return False
+
+
+def _use_model(mode: str | None) -> bool:
+    return (mode or PREDICT_MODE) == "model" and _model is not None
+
+
+def _heuristic_score(detected: list) -> float:
+    return max(0.0, 1.0 - 0.15 * len(detected))  # reduce score for each risky word
+
+
+def _result(score: float, detected: list) -> dict:
+    # Determine verdict
+    if score > 0.7:
+        verdict = "Inbox"
+        suggestion = "Looks safe! Minimal risky words detected."
+    elif 0.4 < score <= 0.7:
+        verdict = "Promotions"
+        suggestion = "Contains some promotional/risky words. Consider rephrasing."
+    else:
+        verdict = "Spam"
+        suggestion = "High risk of going to spam. Avoid risky words and clickbait."
+
+    return {
+        "verdict": verdict,
+        "score": round(score, 2),
+        "risky_words": detected,
+        "suggestion": suggestion,
+    }
+
+
+def predict(subject: str, body: str, mode: str | None = None) -> dict:
+    text = f"{subject} {body}".lower()
+
+    # Detect risky words
+    detected = risky_matcher.find(text)
+
+    if _use_model(mode):
+        score = float(_model.calibrate(_model.predict_proba(subject, body)))
+    else:
+        score = _heuristic_score(detected)
+    return _result(score, detected)
+
+
+PREDICT_CHUNK = 512  # drafts scored per vectorised model call in predict_many
+
+
+def predict_many(emails, mode: str | None = None):
+    """
+    Yield predictions for (subject, body) pairs in input order. Identical
+    drafts are scored once and the result reused; in model mode the unique
+    drafts of each chunk are scored in one vectorised call.
+    """
+    seen = {}
+    chunk = []
+
+    def flush():
+        fresh = list(dict.fromkeys(k for k in chunk if k not in seen))
+        if fresh:
+            scores = _model.calibrate(_model.predict_many(fresh))
+            for (subject, body), score in zip(fresh, scores):
+                detected = risky_matcher.find(f"{subject} {body}".lower())
+                seen[(subject, body)] = _result(float(score), detected)
+        results = [seen[k] for k in chunk]
+        chunk.clear()
+        return results
+
+    if not _use_model(mode):
+        for subject, body in emails:
+            key = (subject, body)
+            result = seen.get(key)
+            if result is None:
+                result = seen[key] = predict(subject, body, mode="heuristic")
+            yield result
+        return
+
+    for subject, body in emails:
+        chunk.append((subject, body))
+        if len(chunk) == PREDICT_CHUNK:
+            yield from flush()
+    yield from flush()
+
+
+def predict_cached(subject: str, body: str) -> dict:
+    """
+    predict() memoised on a hash of the message, for pre-send checks that
+    see the same campaign body many times. Cleared when the lexicon or the
+    model changes.
+    """
+    key = hashlib.sha256(f"{PREDICT_MODE}\0{subject}\0{body}".encode()).hexdigest()
+    result = _verdicts.get(key)
+    if result is None:
+        if len(_verdicts) >= VERDICT_CACHE_SIZE:
+            _verdicts.clear()
+        result = _verdicts[key] = predict(subject, body)
+    return result
@@ -0,0 +1,97 @@
+# services/inbox_sync.py
+import os
+import json
+from googleapiclient.errors import HttpError
+
+SYNC_STATE_FILE = "inbox_sync.json"
+FULL_SYNC_QUERY = "in:inbox newer_than:30d"  # window used when there is no usable cursor
+
+
+def _load_state() -> dict:
+    if os.path.exists(SYNC_STATE_FILE):
+        with open(SYNC_STATE_FILE, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def save_cursor(history_id: str, pending: list | None = None):
+    """
+    Persist the historyId to resume from. Call only after the messages
+    returned with it have been processed; ids that could not be processed
+    go in `pending` and are handed out again by the next sync, in the same
+    atomic write as the cursor that moves past them.
+    """
+    state = {"historyId": history_id}
+    if pending:
+        state["pending"] = list(pending)
+    tmp = SYNC_STATE_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp, SYNC_STATE_FILE)
+
+
+def reset_cursor():
+    if os.path.exists(SYNC_STATE_FILE):
+        os.remove(SYNC_STATE_FILE)
+
+
+def _history_delta(service, start_history_id: str):
+    """
+    Ids of inbox messages added since `start_history_id`, plus the new cursor.
+    """
+    ids, seen, page_token = [], set(), None
+    latest = start_history_id
+    while True:
+        resp = service.users().history().list(
+            userId="me",
+            startHistoryId=start_history_id,
+            historyTypes=["messageAdded"],
+            labelId="INBOX",
+            pageToken=page_token,
+        ).execute()
+        for record in resp.get("history", []):
+            for added in record.get("messagesAdded", []):
+                msg_id = added["message"]["id"]
+                if msg_id not in seen:
+                    seen.add(msg_id)
+                    ids.append(msg_id)
+        latest = resp.get("historyId", latest)
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return ids, latest
+
+
+def _full_sync(service):
+    # take the cursor first so nothing that arrives while listing is missed
+    latest = service.users().getProfile(userId="me").execute().get("historyId")
+    ids, page_token = [], None
+    while True:
+        resp = service.users().messages().list(
+            userId="me", q=FULL_SYNC_QUERY, pageToken=page_token
+        ).execute()
+        ids.extend(m["id"] for m in resp.get("messages", []))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return ids, latest
+
+
+def _changed_since(service, history_id):
+    if history_id:
+        try:
+            return _history_delta(service, history_id)
+        except HttpError as e:
+            if e.resp.status != 404:
+                raise
+            print("[Inbox Sync] historyId expired, running full resync")
+    return _full_sync(service)
+
+
+def changed_message_ids(service):
+    """
+    Return (message_ids, cursor): ids left pending by the last sync plus
+    the inbox deltas since the stored historyId, or a full resync when
+    there is no cursor or it has expired.
+    """
+    state = _load_state()
+    ids, cursor = _changed_since(service, state.get("historyId"))
+    return list(dict.fromkeys(state.get("pending", []) + ids)), cursor
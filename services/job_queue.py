@@ -0,0 +1,236 @@
+# services/job_queue.py
+import json
+import time
+import uuid
+import sqlite3
+import threading
+
+JOBS_DB = "jobs.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    total INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    duplicates INTEGER NOT NULL DEFAULT 0,
+    result TEXT,
+    error TEXT,
+    checkpoint TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id TEXT NOT NULL,
+    key TEXT NOT NULL,
+    content TEXT,
+    status TEXT NOT NULL DEFAULT 'ready',
+    PRIMARY KEY (job_id, key)
+) WITHOUT ROWID;
+"""
+
+
+class Job:
+    """
+    Handle passed to job handlers for reading the payload and reporting progress.
+
+    Handlers that want to survive a restart keep their state here: a
+    `checkpoint` saved together with the progress counters, and per-item
+    records (e.g. generated content) that are acknowledged one by one.
+    """
+
+    def __init__(self, queue: "JobQueue", row: dict):
+        self.queue = queue
+        self.id = row["id"]
+        self.kind = row["kind"]
+        self.payload = json.loads(row["payload"])
+        self.checkpoint = json.loads(row["checkpoint"]) if row.get("checkpoint") else None
+
+    def set_total(self, total: int):
+        self.queue._update(self.id, "total = ?", (total,))
+
+    def progress(self, sent: int = 0, failed: int = 0):
+        self.queue._update(self.id, "sent = sent + ?, failed = failed + ?", (sent, failed))
+
+    def save_checkpoint(self, state: dict, sent: int = 0, failed: int = 0, duplicates: int = 0):
+        """
+        Durably record how far the job got, in the same transaction as the
+        progress it made since the last checkpoint. `duplicates` are items
+        an earlier run already handled (e.g. send-ledger hits), counted
+        apart from real sends.
+        """
+        self.checkpoint = state
+        self.queue._update(
+            self.id, "checkpoint = ?, sent = sent + ?, failed = failed + ?, duplicates = duplicates + ?",
+            (json.dumps(state), sent, failed, duplicates),
+        )
+
+    def store_items(self, items: dict, status: str = "ready"):
+        """
+        Persist {key: content} for this job; existing keys are kept as they are.
+        """
+        with self.queue._lock, self.queue._conn:
+            self.queue._conn.executemany(
+                "INSERT OR IGNORE INTO job_items (job_id, key, content, status) VALUES (?, ?, ?, ?)",
+                [(self.id, key, content, status) for key, content in items.items()],
+            )
+
+    def items(self, prefix: str = "") -> dict:
+        """
+        {key: (content, status)} of stored items, in key order.
+        """
+        with self.queue._lock:
+            rows = self.queue._conn.execute(
+                "SELECT key, content, status FROM job_items WHERE job_id = ? AND key >= ? "
+                "AND key < ? ORDER BY key",
+                (self.id, prefix, prefix + "\uffff"),
+            ).fetchall()
+        return {r["key"]: (r["content"], r["status"]) for r in rows}
+
+    def finish_item(self, key: str, ok: bool):
+        """
+        Acknowledge one item and count it as sent / failed, atomically.
+        """
+        with self.queue._lock, self.queue._conn:
+            cur = self.queue._conn.execute(
+                "UPDATE job_items SET status = ? WHERE job_id = ? AND key = ? AND status = 'ready'",
+                ("sent" if ok else "failed", self.id, key),
+            )
+            if cur.rowcount:
+                self.queue._conn.execute(
+                    "UPDATE jobs SET sent = sent + ?, failed = failed + ? WHERE id = ?",
+                    (int(ok), int(not ok), self.id),
+                )
+
+
+class JobQueue:
+    """
+    Persistent local job queue backed by SQLite. Jobs left `running` by a
+    crashed process are put back in the queue on start().
+    """
+
+    def __init__(self, path: str = JOBS_DB):
+        self.path = path
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._workers = []
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "checkpoint" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN checkpoint TEXT")
+        if "duplicates" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN duplicates INTEGER NOT NULL DEFAULT 0")
+
+    def register(self, kind: str, handler):
+        """
+        `handler(job)` runs the job and returns a JSON-serialisable result.
+        """
+        self._handlers[kind] = handler
+
+    def _update(self, job_id: str, assignments: str, params: tuple):
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*params, job_id))
+
+    # ----------------- Producer side -----------------
+    def enqueue(self, kind: str, payload: dict, total: int = 0) -> str:
+        job_id = str(uuid.uuid4())
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, status, payload, total, created_at) "
+                "VALUES (?, ?, 'queued', ?, ?, ?)",
+                (job_id, kind, json.dumps(payload), total, time.time()),
+            )
+        self._wakeup.set()
+        return job_id
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        done = job["sent"] + job["failed"] + job["duplicates"]
+        elapsed = None
+        if job["started_at"]:
+            elapsed = (job["finished_at"] or time.time()) - job["started_at"]
+        return {
+            "id": job["id"],
+            "kind": job["kind"],
+            "status": job["status"],
+            "total": job["total"],
+            "sent": job["sent"],
+            "failed": job["failed"],
+            "duplicates": job["duplicates"],
+            "remaining": max(0, job["total"] - done),
+            "throughput_per_sec": round(done / elapsed, 2) if elapsed else 0.0,
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "checkpoint": json.loads(job["checkpoint"]) if job["checkpoint"] else None,
+            "result": json.loads(job["result"]) if job["result"] else None,
+            "error": job["error"],
+        }
+
+    # ----------------- Worker side -----------------
+    def _claim(self):
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+            ).fetchone()
+            if not row:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = COALESCE(started_at, ?) WHERE id = ?",
+                (time.time(), row["id"]),
+            )
+        return dict(row)
+
+    def _run(self, row: dict):
+        job = Job(self, row)
+        try:
+            handler = self._handlers[job.kind]
+            result = handler(job)
+            self._update(job.id, "status = 'done', result = ?, finished_at = ?",
+                         (json.dumps(result, default=str), time.time()))
+        except Exception as e:
+            print(f"[Job Queue] Job {job.id} ({job.kind}) failed: {e}")
+            self._update(job.id, "status = 'failed', error = ?, finished_at = ?",
+                         (str(e), time.time()))
+
+    def _worker(self):
+        while True:
+            row = self._claim()
+            if row is None:
+                self._wakeup.wait(timeout=5)
+                self._wakeup.clear()
+                continue
+            self._run(row)
+
+    def start(self, workers: int = 1):
+        """
+        Re-queue jobs interrupted by a restart and start the worker threads.
+        Jobs that checkpointed keep their counters and resume; the others
+        start over from zero.
+        """
+        if self._workers:
+            return
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND (checkpoint IS NOT NULL "
+                "OR EXISTS (SELECT 1 FROM job_items WHERE job_items.job_id = jobs.id))"
+            )
+            self._conn.execute("UPDATE jobs SET status = 'queued', sent = 0, failed = 0, duplicates = 0 "
+                               "WHERE status = 'running'")
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._workers.append(t)
@@ -0,0 +1,356 @@
+# services/journal.py
+import os
+import json
+import pickle
+import threading
+
+COMPACT_EVERY = 1000  # journal lines before folding them into the snapshot
+
+
+def _read_lines(f):
+    """
+    Yield parsed JSON lines, skipping a torn last line left by a crash.
+    """
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError:
+            continue
+
+
+def _apply(record, op):
+    """
+    Apply a patch/push op to a record. Returns None when the op deletes it.
+    """
+    kind = op["op"]
+    if kind == "delete":
+        return None
+    if kind == "patch":
+        record.update(op["fields"])
+    elif kind == "push":
+        record.setdefault(op["field"], []).append(op["value"])
+    return record
+
+
+class Journal:
+    """
+    Append-only JSONL log of record operations on top of a JSONL snapshot.
+
+    Every record gets a monotonically increasing `seq` when it is added.
+    Writes are single appended lines; reads replay snapshot + journal tail.
+    Once the journal grows past `compact_every` lines it is folded into a
+    fresh snapshot. Snapshot and journal carry an epoch header so a crash
+    half-way through compaction never replays ops twice.
+
+    An optional `index` (see services/email_index.py) is told where every
+    record line lives, so single records can be found without a replay.
+    """
+
+    def __init__(self, snapshot_path: str, journal_path: str,
+                 legacy_path: str | None = None, compact_every: int = COMPACT_EVERY,
+                 index=None):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.legacy_path = legacy_path
+        self.compact_every = compact_every
+        self.index = index
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._epoch = 0
+        self._next_seq = 1
+        self._journal_lines = 0
+
+    # ----------------- Setup -----------------
+    def _snapshot_header(self):
+        if not os.path.exists(self.snapshot_path):
+            return {"epoch": 0, "max_seq": 0}
+        with open(self.snapshot_path, "r") as f:
+            return json.loads(f.readline() or '{"epoch": 0, "max_seq": 0}')
+
+    def _import_legacy(self):
+        """
+        Turn a legacy JSON-array (or pickled list, for .pkl paths) file into
+        the first snapshot (seq = position).
+        """
+        if self.legacy_path.endswith(".pkl"):
+            with open(self.legacy_path, "rb") as f:
+                data = pickle.load(f) or []
+        else:
+            with open(self.legacy_path, "r") as f:
+                data = json.load(f) or []
+        self._write_snapshot(((i, r) for i, r in enumerate(data, start=1)),
+                             epoch=0, max_seq=len(data))
+        os.replace(self.legacy_path, self.legacy_path + ".migrated")
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        if (not os.path.exists(self.snapshot_path) and self.legacy_path
+                and os.path.exists(self.legacy_path)):
+            self._import_legacy()
+
+        header = self._snapshot_header()
+        max_seq = header.get("max_seq", 0)
+        self._epoch = header.get("epoch", 0) + 1
+
+        self._truncate_torn_tail()
+        ops = self._journal_ops(header["epoch"])
+        if ops is None:
+            # no journal yet, or one already folded into the snapshot
+            self._start_journal(self._epoch)
+        else:
+            self._journal_lines = len(ops)
+            for op in ops:
+                if op["op"] == "add":
+                    max_seq = max(max_seq, op["seq"])
+
+        self._next_seq = max_seq + 1
+        self._loaded = True
+
+        # an index that missed writes (crash between append and index update)
+        # is rebuilt from a fresh snapshot
+        if self.index is not None and self.index.max_seq() != max_seq:
+            self.compact()
+
+    def load(self):
+        """
+        Open the store eagerly (legacy import, index catch-up) instead of on first use.
+        """
+        with self._lock:
+            self._ensure_loaded()
+
+    def _journal_ops(self, snapshot_epoch: int):
+        """
+        Return the journal ops not yet covered by the snapshot, or None.
+        """
+        if not os.path.exists(self.journal_path):
+            return None
+        with open(self.journal_path, "r") as f:
+            lines = _read_lines(f)
+            header = next(lines, None)
+            if not header or header.get("epoch", 0) <= snapshot_epoch:
+                return None
+            return list(lines)
+
+    def _truncate_torn_tail(self):
+        """
+        Cut a torn last line (crash mid-append) back to the last newline, so
+        the next append starts on a line of its own instead of extending it.
+        """
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r+b") as f:
+            end = f.seek(0, os.SEEK_END)
+            pos = end
+            while pos > 0:
+                step = min(4096, pos)
+                f.seek(pos - step)
+                chunk = f.read(step)
+                newline = chunk.rfind(b"\n")
+                if newline != -1:
+                    pos = pos - step + newline + 1
+                    break
+                pos -= step
+            if pos != end:
+                print(f"[Journal] Dropping {end - pos} bytes of torn tail in {self.journal_path}")
+                f.truncate(pos)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _start_journal(self, epoch: int):
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(json.dumps({"epoch": epoch}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+        self._journal_lines = 0
+
+    def _write_snapshot(self, items, epoch: int, max_seq: int):
+        tmp = self.snapshot_path + ".tmp"
+        located = []
+        with open(tmp, "wb") as f:
+            f.write((json.dumps({"epoch": epoch, "max_seq": max_seq}) + "\n").encode())
+            for seq, record in items:
+                located.append((seq, record, ("s", f.tell())))
+                f.write((json.dumps({"seq": seq, "record": record}) + "\n").encode())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.snapshot_path)
+        if self.index is not None:
+            self.index.rebuilt(located, max_seq)
+
+    # ----------------- Writes -----------------
+    def _append(self, ops: list):
+        added, deleted = [], []
+        with open(self.journal_path, "a+b") as f:
+            # a failed earlier write may have left a partial line behind
+            end = f.seek(0, os.SEEK_END)
+            if end:
+                f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            for op in ops:
+                if op["op"] == "add":
+                    added.append((op["seq"], op["record"], ("j", f.tell())))
+                elif op["op"] == "delete":
+                    deleted.append(op["seq"])
+                f.write((json.dumps(op) + "\n").encode())
+            f.flush()
+        if self.index is not None:
+            if added:
+                self.index.added(added)
+            if deleted:
+                self.index.deleted(deleted)
+        self._journal_lines += len(ops)
+        if self._journal_lines >= self.compact_every:
+            self.compact()
+
+    def add(self, record: dict) -> int:
+        return self.add_many([record])[0]
+
+    def add_many(self, records: list) -> list:
+        """
+        Append several records with one write. Returns their seqs.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            seqs = list(range(self._next_seq, self._next_seq + len(records)))
+            self._next_seq += len(records)
+            if records:
+                self._append([{"op": "add", "seq": s, "record": r}
+                              for s, r in zip(seqs, records)])
+            return seqs
+
+    def patch(self, seq: int, fields: dict):
+        with self._lock:
+            self._ensure_loaded()
+            self._append([{"op": "patch", "seq": seq, "fields": fields}])
+
+    def push(self, seq: int, field: str, value):
+        with self._lock:
+            self._ensure_loaded()
+            self._append([{"op": "push", "seq": seq, "field": field, "value": value}])
+
+    def delete(self, seq: int):
+        with self._lock:
+            self._ensure_loaded()
+            self._append([{"op": "delete", "seq": seq}])
+
+    def rewrite(self, records: list) -> list:
+        """
+        Replace the whole collection (legacy full-save path). Returns new seqs.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            seqs = list(range(self._next_seq, self._next_seq + len(records)))
+            self._next_seq += len(records)
+            self._write_snapshot(zip(seqs, records), epoch=self._epoch,
+                                 max_seq=self._next_seq - 1)
+            self._epoch += 1
+            self._start_journal(self._epoch)
+            return seqs
+
+    def compact(self):
+        with self._lock:
+            self._ensure_loaded()
+            items = list(self.iter_records())
+            self._write_snapshot(items, epoch=self._epoch, max_seq=self._next_seq - 1)
+            self._epoch += 1
+            self._start_journal(self._epoch)
+
+    # ----------------- Reads -----------------
+    def iter_records(self, after: int | None = None):
+        """
+        Stream (seq, record) pairs in seq order without materialising the
+        snapshot. Only the journal tail (bounded by compaction) is held in memory.
+        With `after`, only records with a larger seq; when there is an index
+        the snapshot is read from the first such record's byte offset.
+        """
+        with self._lock:
+            self._ensure_loaded()
+            start = None
+            if after is not None and self.index is not None:
+                start = self.index.first_location_after(after) or ("j", 0)
+            return self._replay(after, start)
+
+    def iter_records_readonly(self):
+        """
+        iter_records() for a store another process owns: reads the files as
+        they are, with no legacy import, torn-tail truncation, new journal
+        or index catch-up.
+        """
+        return self._replay()
+
+    def _replay(self, after: int | None = None, start=None):
+        header = self._snapshot_header()
+        ops = self._journal_ops(header["epoch"]) or []
+        snapshot = None
+        if os.path.exists(self.snapshot_path) and (start is None or start[0] == "s"):
+            snapshot = open(self.snapshot_path, "rb")
+            if start is not None:
+                snapshot.seek(start[1])
+            else:
+                snapshot.readline()  # header
+        return self._merge(ops, snapshot, after)
+
+    def _merge(self, ops, snapshot, after):
+        overlay, tail = {}, {}
+        for op in ops:
+            seq = op["seq"]
+            if after is not None and seq <= after:
+                continue
+            if op["op"] == "add":
+                tail[seq] = op["record"]
+            elif seq in tail:
+                record = _apply(tail[seq], op)
+                if record is None:
+                    del tail[seq]
+            else:
+                overlay.setdefault(seq, []).append(op)
+
+        if snapshot:
+            with snapshot:
+                for item in _read_lines(snapshot):
+                    if after is not None and item["seq"] <= after:
+                        continue
+                    record = item["record"]
+                    for op in overlay.get(item["seq"], ()):
+                        record = _apply(record, op)
+                        if record is None:
+                            break
+                    if record is not None:
+                        yield item["seq"], record
+
+        yield from tail.items()
+
+    def records(self) -> list:
+        return [record for _, record in self.iter_records()]
+
+    def read(self, seq: int, location) -> dict | None:
+        """
+        Read one record from the (source, offset) an index handed out and
+        apply its pending journal ops. Returns None if it has been deleted.
+        """
+        source, offset = location
+        with self._lock:
+            self._ensure_loaded()
+            path = self.snapshot_path if source == "s" else self.journal_path
+            with open(path, "rb") as f:
+                f.seek(offset)
+                line = json.loads(f.readline())
+            if line.get("seq") != seq:
+                return None  # stale location
+            record = line["record"]
+            header = self._snapshot_header()
+            for op in self._journal_ops(header["epoch"]) or []:
+                if op["seq"] != seq or op["op"] == "add":
+                    continue
+                record = _apply(record, op)
+                if record is None:
+                    return None
+            return record
+
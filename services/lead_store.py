@@ -0,0 +1,408 @@
+# services/lead_store.py
+import os
+import json
+import base64
+import pickle
+import sqlite3
+import threading
+
+LEADS_DB = "leads.db"
+LEGACY_PICKLE = "leads.pkl"
+LEGACY_JSON = "leads.json"
+
+# Columns of the Lead model, in table order (id is the primary key)
+LEAD_FIELDS = [
+    "name", "email", "company", "role", "score", "last_contacted",
+    "status", "opened", "clicked", "replied", "score_value",
+]
+# Writes to any of these make the lead's score stale
+SCORE_INPUTS = {"last_contacted", "status", "opened", "clicked", "replied"}
+
+# Columns added after the first release, created on open if missing
+_ADDED_COLUMNS = {
+    "score_value": "REAL",
+    # databases created before incremental scoring: score everything once
+    "dirty": "INTEGER NOT NULL DEFAULT 1",
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS leads (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT,
+    email TEXT NOT NULL,
+    company TEXT,
+    role TEXT,
+    score,
+    last_contacted TEXT,
+    status TEXT NOT NULL DEFAULT 'new',
+    opened INTEGER NOT NULL DEFAULT 0,
+    clicked INTEGER NOT NULL DEFAULT 0,
+    replied INTEGER NOT NULL DEFAULT 0,
+    score_value REAL,
+    dirty INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_leads_email ON leads(email);
+CREATE INDEX IF NOT EXISTS idx_leads_status ON leads(status);
+CREATE INDEX IF NOT EXISTS idx_leads_score ON leads(score);
+CREATE INDEX IF NOT EXISTS idx_leads_company ON leads(company COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_leads_last_contacted ON leads(last_contacted);
+CREATE INDEX IF NOT EXISTS idx_leads_replied ON leads(replied);
+"""
+
+
+# Columns /lead/query may sort by
+SORTABLE_FIELDS = {
+    "id", "name", "email", "company", "score", "score_value",
+    "last_contacted", "opened", "clicked",
+}
+
+
+def encode_cursor(value, lead_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([value, lead_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple:
+    value, lead_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return value, int(lead_id)
+
+
+def _after(sort: str, descending: bool, value, lead_id: int) -> tuple:
+    """
+    Keyset condition for rows after (value, id) in ORDER BY sort, id.
+    SQLite puts NULLs first ascending and last descending.
+    """
+    if sort == "id":
+        return ("id < ?" if descending else "id > ?"), [lead_id]
+    op, id_op = ("<", "<") if descending else (">", ">")
+    if value is None:
+        if descending:
+            return f"({sort} IS NULL AND id < ?)", [lead_id]
+        return f"({sort} IS NOT NULL OR id > ?)", [lead_id]
+    cond = f"({sort} {op} ? OR ({sort} = ? AND id {id_op} ?)"
+    cond += f" OR {sort} IS NULL)" if descending else ")"
+    return cond, [value, value, lead_id]
+
+
+def _row_to_lead(row) -> dict:
+    lead = dict(row)
+    lead.pop("dirty", None)
+    lead["replied"] = bool(lead.get("replied"))
+    return lead
+
+
+def _lead_values(lead: dict) -> dict:
+    """
+    Normalise a lead dict (pydantic dump, pickle or json entry) to table columns.
+    """
+    values = {f: lead.get(f) for f in LEAD_FIELDS}
+    values["status"] = values["status"] or "new"
+    values["score"] = 0.0 if values["score"] is None else values["score"]
+    values["opened"] = int(values["opened"] or 0)
+    values["clicked"] = int(values["clicked"] or 0)
+    values["replied"] = 1 if values["replied"] else 0
+    return values
+
+
+class LeadStore:
+    """
+    SQLite-backed lead storage. Every write touches only the affected rows,
+    lookups by id / email / status / score go through indexes.
+
+    Each lead carries a `dirty` counter that is bumped whenever a scoring
+    input changes, so scoring only has to revisit those rows.
+    """
+
+    def __init__(self, path: str = LEADS_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {r["name"] for r in self._conn.execute("PRAGMA table_info(leads)")}
+        for column, decl in _ADDED_COLUMNS.items():
+            if column not in columns:
+                self._conn.execute(f"ALTER TABLE leads ADD COLUMN {column} {decl}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_dirty ON leads(dirty) WHERE dirty > 0")
+        # refresh planner statistics so filtered queries pick the right index
+        self._conn.execute("PRAGMA optimize")
+
+    # ----------------- Writes -----------------
+    def add(self, lead: dict) -> dict:
+        values = _lead_values(lead)
+        if lead.get("id"):
+            values["id"] = int(lead["id"])
+        cols = ", ".join(values)
+        marks = ", ".join("?" for _ in values)
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                f"INSERT INTO leads ({cols}) VALUES ({marks})", list(values.values())
+            )
+            lead_id = cur.lastrowid
+        return self.get(lead_id)
+
+    def add_many(self, leads: list) -> int:
+        rows = [_lead_values(l) for l in leads]
+        if not rows:
+            return 0
+        cols = ", ".join(LEAD_FIELDS)
+        marks = ", ".join("?" for _ in LEAD_FIELDS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO leads ({cols}) VALUES ({marks})",
+                [[r[f] for f in LEAD_FIELDS] for r in rows],
+            )
+        return len(rows)
+
+    def import_legacy(self, pickled: list, from_json: list) -> int:
+        """
+        Insert leads from the legacy files in one transaction, so a failed
+        import leaves nothing behind. Pickled leads keep their id when it is
+        still free; json leads are skipped if their email is already stored.
+        """
+        imported = 0
+        with self._lock, self._conn:
+            for lead in pickled:
+                values = _lead_values(lead)
+                # ids from the pickle were renumbered on delete, keep them only if free
+                if lead.get("id") and not self._conn.execute(
+                        "SELECT 1 FROM leads WHERE id = ?", (lead["id"],)).fetchone():
+                    values["id"] = int(lead["id"])
+                self._conn.execute(
+                    f"INSERT INTO leads ({', '.join(values)}) VALUES ({', '.join('?' for _ in values)})",
+                    list(values.values()),
+                )
+                imported += 1
+            for lead in from_json:
+                if not lead.get("email") or self._conn.execute(
+                        "SELECT 1 FROM leads WHERE email = ?", (lead["email"],)).fetchone():
+                    continue
+                values = _lead_values(lead)
+                self._conn.execute(
+                    f"INSERT INTO leads ({', '.join(LEAD_FIELDS)}) "
+                    f"VALUES ({', '.join('?' for _ in LEAD_FIELDS)})",
+                    [values[f] for f in LEAD_FIELDS],
+                )
+                imported += 1
+        return imported
+
+    def update(self, lead_id: int, **fields) -> bool:
+        fields = {k: v for k, v in fields.items() if k in LEAD_FIELDS}
+        if not fields:
+            return False
+        if "replied" in fields:
+            fields["replied"] = 1 if fields["replied"] else 0
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        if SCORE_INPUTS & fields.keys():
+            assignments += ", dirty = dirty + 1"
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                f"UPDATE leads SET {assignments} WHERE id = ?",
+                [*fields.values(), lead_id],
+            )
+        return cur.rowcount > 0
+
+    def update_many(self, field: str, values: list) -> int:
+        """
+        Set one column for many leads in a single transaction.
+        `values` is a list of (lead_id, value) pairs.
+        """
+        if field not in LEAD_FIELDS:
+            raise ValueError(f"Unknown lead field: {field}")
+        assignment = f"{field} = ?"
+        if field in SCORE_INPUTS:
+            assignment += ", dirty = dirty + 1"
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"UPDATE leads SET {assignment} WHERE id = ?",
+                [(value, lead_id) for lead_id, value in values],
+            )
+        return len(values)
+
+    def increment_counters(self, counts: list) -> int:
+        """
+        Add tracked opens / clicks in one transaction. `counts` holds
+        (lead_id, opens, clicks) triples.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE leads SET opened = opened + ?, clicked = clicked + ?, dirty = dirty + 1 "
+                "WHERE id = ?",
+                [(opens, clicks, lead_id) for lead_id, opens, clicks in counts],
+            )
+        return len(counts)
+
+    def save_scores(self, changed: list, clean: list) -> int:
+        """
+        Write scores for leads read with scoring_rows().
+        `changed` holds (lead_id, score, score_value) for rows whose score
+        moved; `clean` holds (lead_id, dirty) for every row that was scored.
+        A lead is only marked clean if it hasn't changed again since it was read.
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE leads SET score = ?, score_value = ? WHERE id = ?",
+                [(score, value, lead_id) for lead_id, score, value in changed],
+            )
+            self._conn.executemany(
+                "UPDATE leads SET dirty = 0 WHERE id = ? AND dirty = ?",
+                clean,
+            )
+        return len(changed)
+
+    def delete(self, lead_id: int) -> bool:
+        with self._lock, self._conn:
+            cur = self._conn.execute("DELETE FROM leads WHERE id = ?", (lead_id,))
+        return cur.rowcount > 0
+
+    # ----------------- Reads -----------------
+    def get(self, lead_id: int) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM leads WHERE id = ?", (lead_id,)
+            ).fetchone()
+        return _row_to_lead(row) if row else None
+
+    def find_by_email(self, email: str) -> list:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM leads WHERE email = ? ORDER BY id", (email,)
+            ).fetchall()
+        return [_row_to_lead(r) for r in rows]
+
+    def select(self, status: str | None = None, score=None) -> list:
+        where, params = [], []
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if score is not None:
+            where.append("score = ?")
+            params.append(score)
+        sql = "SELECT * FROM leads"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_row_to_lead(r) for r in rows]
+
+    def query(self, status: str | None = None, score=None, company: str | None = None,
+              contacted_after: str | None = None, contacted_before: str | None = None,
+              replied: bool | None = None, sort: str = "id", descending: bool = False,
+              limit: int = 100, cursor: str | None = None) -> dict:
+        """
+        Filtered, sorted page of leads. Every filter maps to an indexed
+        column; pages are keyset-paginated on (sort, id) so deep pages cost
+        the same as the first. `next_cursor` is None on the last page.
+        """
+        if sort not in SORTABLE_FIELDS:
+            raise ValueError(f"Cannot sort by {sort}")
+        where, params = [], []
+        if status is not None:
+            where.append("status = ?")
+            params.append(status)
+        if score is not None:
+            where.append("score = ?")
+            params.append(score)
+        if company is not None:
+            where.append("company = ? COLLATE NOCASE")
+            params.append(company)
+        if contacted_after is not None:
+            where.append("last_contacted >= ?")
+            params.append(contacted_after)
+        if contacted_before is not None:
+            where.append("last_contacted < ?")
+            params.append(contacted_before)
+        if replied is not None:
+            where.append("replied = ?")
+            params.append(1 if replied else 0)
+        if cursor:
+            cond, cursor_params = _after(sort, descending, *decode_cursor(cursor))
+            where.append(cond)
+            params.extend(cursor_params)
+
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT * FROM leads"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {sort} {direction}" + ("" if sort == "id" else f", id {direction}")
+        sql += " LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, [*params, limit + 1]).fetchall()
+
+        items = [_row_to_lead(r) for r in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[sort], last["id"])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def scoring_rows(self, full: bool = False) -> list:
+        """
+        Numeric scoring inputs for the scoring engine, dirty rows only unless
+        `full`: (id, dirty, contacted, opened, clicked, replied,
+        last_contacted as julian day, score_value, score) tuples.
+        """
+        sql = (
+            "SELECT id, dirty, status = 'contacted', COALESCE(opened, 0), COALESCE(clicked, 0), "
+            "replied != 0, julianday(last_contacted), score_value, score "
+            "FROM leads" + ("" if full else " WHERE dirty > 0") + " ORDER BY id"
+        )
+        with self._lock:
+            cur = self._conn.execute(sql)
+            cur.row_factory = None  # plain tuples, no per-row dict overhead
+            return cur.fetchall()
+
+    def iter_after(self, after_id: int | None = None, batch: int = 500):
+        """
+        Yield (id, lead) pairs in id order, reading `batch` rows at a time.
+        """
+        last_id = after_id or 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT * FROM leads WHERE id > ? ORDER BY id LIMIT ?",
+                    (last_id, batch),
+                ).fetchall()
+            for row in rows:
+                yield row["id"], _row_to_lead(row)
+            if len(rows) < batch:
+                return
+            last_id = rows[-1]["id"]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM leads").fetchone()[0]
+
+
+# ----------------- One-shot migration -----------------
+def migrate_legacy_leads(store: LeadStore, pickle_path: str = LEGACY_PICKLE,
+                         json_path: str = LEGACY_JSON) -> int:
+    """
+    Import leads from the old leads.pkl (main.py) and leads.json
+    (services/storage.py) files in a single transaction. Only once it has
+    committed is each source file renamed to `<name>.migrated`, so a crash
+    mid-import leaves the files in place and the next start retries cleanly.
+    """
+    pickled, from_json = [], []
+    if os.path.exists(pickle_path):
+        with open(pickle_path, "rb") as f:
+            pickled = [dict(lead) for lead in pickle.load(f) or []]
+    if os.path.exists(json_path):
+        with open(json_path, "r") as f:
+            from_json = json.load(f) or []
+
+    imported = store.import_legacy(pickled, from_json)
+
+    for path in (pickle_path, json_path):
+        if os.path.exists(path):
+            os.replace(path, path + ".migrated")
+
+    if imported:
+        print(f"[LeadStore] Migrated {imported} legacy leads into {store.path}")
+    return imported
+
+
+if __name__ == "__main__":
+    migrate_legacy_leads(LeadStore())
@@ -0,0 +1,38 @@
+# services/pagination.py
+import json
+from fastapi.responses import StreamingResponse
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def paginate(keyed_items, limit: int | None = None, cursor: int | None = None) -> dict:
+    """
+    Cut one page out of an iterable of (key, record) pairs sorted by key.
+    `cursor` is the key of the last record the client already has;
+    `next_cursor` is None once the collection is exhausted.
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    items, last_key, next_cursor = [], None, None
+    for key, record in keyed_items:
+        if cursor is not None and key <= cursor:
+            continue
+        if len(items) == limit:
+            next_cursor = last_key
+            break
+        items.append(record)
+        last_key = key
+    return {"items": items, "next_cursor": next_cursor}
+
+
+def ndjson_response(keyed_items, cursor: int | None = None) -> StreamingResponse:
+    """
+    Stream records as newline-delimited JSON while they are read from storage.
+    """
+    def lines():
+        for key, record in keyed_items:
+            if cursor is not None and key <= cursor:
+                continue
+            yield json.dumps(record, default=str) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
@@ -1,6 +1,7 @@
 # services/replies_service.py
 from typing import List, Dict
 from .gmail_auth import get_gmail_service
+from .gmail_batch import fetch_messages
 
 def fetch_replies() -> List[Dict]:
     service = get_gmail_service()
@@ -8,8 +9,8 @@ def fetch_replies() -> List[Dict]:
     messages = results.get("messages", [])
 
     replies = []
-    for msg in messages[:10]:  # sirf last 10 replies fetch
-        msg_data = service.users().messages().get(userId="me", id=msg["id"]).execute()
+    latest = messages[:10]  # sirf last 10 replies fetch
+    for msg_data in fetch_messages(service, [m["id"] for m in latest]):
         payload = msg_data.get("payload", {})
         headers = payload.get("headers", [])
 
@@ -34,7 +35,7 @@ def fetch_replies() -> List[Dict]:
             "from": from_,
             "subject": subject,
             "body": body.strip(),
-            "threadId": msg.get("threadId", "")
+            "threadId": msg_data.get("threadId", "")
         })
 
     return replies
@@ -0,0 +1,147 @@
+# services/send_engine.py
+import os
+import time
+import base64
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from concurrent.futures import ThreadPoolExecutor
+from googleapiclient.errors import HttpError
+
+from services.gmail_auth import get_gmail_service
+from services.send_ledger import send_ledger
+from services import tracking
+
+SEND_WORKERS = int(os.getenv("GMAIL_SEND_WORKERS", "4"))
+# Gmail per-user quota: 250 units/second, messages.send costs 100 units
+QUOTA_UNITS_PER_SECOND = float(os.getenv("GMAIL_QUOTA_UNITS_PER_SECOND", "250"))
+SEND_COST_UNITS = 100
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; acquire() blocks until enough units are available.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, units: float):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= units:
+                    self._tokens -= units
+                    return
+                wait = (units - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(account: str = "me") -> TokenBucket:
+    with _buckets_lock:
+        if account not in _buckets:
+            _buckets[account] = TokenBucket(QUOTA_UNITS_PER_SECOND, QUOTA_UNITS_PER_SECOND)
+        return _buckets[account]
+
+
+def create_message(to: str, subject: str, body: str, html: str | None = None):
+    if html is None:
+        msg = MIMEText(body)
+    else:
+        msg = MIMEMultipart("alternative")
+        msg.attach(MIMEText(body, "plain"))
+        msg.attach(MIMEText(html, "html"))
+    msg["to"] = to
+    msg["subject"] = subject
+    raw = base64.urlsafe_b64encode(msg.as_bytes()).decode()
+    return {"raw": raw}
+
+
+UNCONFIRMED_SEND = "An earlier attempt was interrupted mid-send; it may have gone out, so it is not resent"
+
+
+def send_one(msg: dict, account: str = "me") -> dict:
+    """
+    Send one {"to", "subject", "body"[, "threadId", "campaign", "lead_id"]}
+    message within the quota. Messages with a `campaign` go through the send
+    ledger: a recipient already handled in that campaign is not sent again
+    and the earlier attempt is returned with "duplicate": True and its
+    "ledger_status" ("sent", or "pending" when an earlier attempt died
+    mid-send and may or may not have gone out). Messages with
+    a `lead_id` get an HTML part with tracked links and an open pixel when
+    tracking is configured.
+    """
+    campaign = msg.get("campaign")
+    if campaign:
+        earlier = send_ledger.claim(campaign, msg["to"])
+        if earlier is not None:
+            return {"id": earlier["message_id"], "threadId": earlier["thread_id"],
+                    "duplicate": True, "ledger_status": earlier["status"]}
+
+    try:
+        get_bucket(account).acquire(SEND_COST_UNITS)
+        service = get_gmail_service()
+        if not service:
+            raise RuntimeError("Not authenticated")
+        html = tracking.tracked_html(msg["body"], msg["lead_id"]) if msg.get("lead_id") else None
+        message = create_message(msg["to"], msg["subject"], msg["body"], html)
+        if msg.get("threadId"):
+            message["threadId"] = msg["threadId"]
+    except Exception as e:
+        if campaign:
+            send_ledger.mark_failed(campaign, msg["to"], str(e))
+        raise
+
+    try:
+        sent = service.users().messages().send(userId="me", body=message).execute()
+    except HttpError as e:
+        # Gmail rejected it (4xx): safe to retry later. On 5xx or a dropped
+        # connection the message may have gone out, so the entry stays pending.
+        if campaign and e.resp.status < 500:
+            send_ledger.mark_failed(campaign, msg["to"], str(e))
+        raise
+    if campaign:
+        send_ledger.mark_sent(campaign, msg["to"], sent.get("id"), sent.get("threadId"))
+    return sent
+
+
+def send_many(messages: list, workers: int = SEND_WORKERS, account: str = "me",
+              on_result=None) -> list:
+    """
+    Send messages on a worker pool, keeping several Gmail requests in flight.
+    Returns one result per message, in input order:
+    {"to", "ok", "threadId", "messageId"} or {"to", "ok": False, "error"}.
+    Ledger duplicates (see send_one) carry "duplicate": True; they are ok
+    only if the earlier attempt is known to be sent, otherwise they come
+    back not ok with "status": "unknown" and are never resent.
+    `on_result(result)` is called as each send finishes.
+    """
+    def run(msg):
+        try:
+            sent = send_one(msg, account)
+            result = {"to": msg["to"], "ok": True,
+                      "threadId": sent.get("threadId"), "messageId": sent.get("id")}
+            if sent.get("duplicate"):
+                result["duplicate"] = True
+                if sent["ledger_status"] != "sent":
+                    result.update(ok=False, status="unknown", error=UNCONFIRMED_SEND)
+        except Exception as e:
+            result = {"to": msg["to"], "ok": False, "error": str(e)}
+        if on_result:
+            on_result(result)
+        return result
+
+    if not messages:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(messages)))) as pool:
+        return list(pool.map(run, messages))
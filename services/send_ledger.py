@@ -0,0 +1,120 @@
+# services/send_ledger.py
+import json
+import time
+import sqlite3
+import threading
+
+SEND_LEDGER_DB = "send_ledger.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (
+    campaign TEXT NOT NULL,
+    recipient TEXT NOT NULL,
+    status TEXT NOT NULL,
+    message_id TEXT,
+    thread_id TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (campaign, recipient)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS idempotent_requests (
+    key TEXT PRIMARY KEY,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+class SendLedger:
+    """
+    Per-recipient record of every campaign send, written *before* the
+    Gmail call. A (campaign, recipient) pair that is already `sent`, or
+    still `pending` because an earlier attempt died mid-send, is not sent
+    again. Only sends that definitely failed can be retried.
+
+    Also remembers the response of requests made with an Idempotency-Key.
+    """
+
+    def __init__(self, path: str = SEND_LEDGER_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+
+    # ----------------- Per-recipient ledger -----------------
+    def claim(self, campaign: str, recipient: str) -> dict | None:
+        """
+        Record the intent to send. Returns None if the caller should send,
+        or the existing ledger entry if this recipient was already handled.
+        """
+        recipient = recipient.strip().lower()
+        with self._lock, self._conn:
+            cur = self._conn.execute(
+                "INSERT OR IGNORE INTO ledger (campaign, recipient, status, updated_at) "
+                "VALUES (?, ?, 'pending', ?)",
+                (campaign, recipient, time.time()),
+            )
+            if cur.rowcount:
+                return None
+            cur = self._conn.execute(
+                "UPDATE ledger SET status = 'pending', error = NULL, updated_at = ? "
+                "WHERE campaign = ? AND recipient = ? AND status = 'failed'",
+                (time.time(), campaign, recipient),
+            )
+            if cur.rowcount:
+                return None
+            row = self._conn.execute(
+                "SELECT * FROM ledger WHERE campaign = ? AND recipient = ?", (campaign, recipient)
+            ).fetchone()
+        return dict(row)
+
+    def _finish(self, campaign: str, recipient: str, status: str, **fields):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE ledger SET status = ?, message_id = ?, thread_id = ?, error = ?, updated_at = ? "
+                "WHERE campaign = ? AND recipient = ?",
+                (status, fields.get("message_id"), fields.get("thread_id"), fields.get("error"),
+                 time.time(), campaign, recipient.strip().lower()),
+            )
+
+    def mark_sent(self, campaign: str, recipient: str, message_id: str | None, thread_id: str | None):
+        self._finish(campaign, recipient, "sent", message_id=message_id, thread_id=thread_id)
+
+    def mark_failed(self, campaign: str, recipient: str, error: str):
+        self._finish(campaign, recipient, "failed", error=error)
+
+    def get(self, campaign: str, recipient: str) -> dict | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM ledger WHERE campaign = ? AND recipient = ?",
+                (campaign, recipient.strip().lower()),
+            ).fetchone()
+        return dict(row) if row else None
+
+    # ----------------- Idempotent requests -----------------
+    def once(self, key: str, make_response):
+        """
+        Return the stored response for `key`, or run `make_response()` once
+        and store its result. Returns (response, replayed).
+        """
+        with self._request_lock:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT response FROM idempotent_requests WHERE key = ?", (key,)
+                ).fetchone()
+            if row:
+                return json.loads(row["response"]), True
+            response = make_response()
+            with self._lock, self._conn:
+                self._conn.execute(
+                    "INSERT INTO idempotent_requests (key, response, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(response, default=str), time.time()),
+                )
+            return response, False
+
+
+send_ledger = SendLedger()
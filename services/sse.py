@@ -0,0 +1,26 @@
+# services/sse.py
+import json
+from fastapi.responses import StreamingResponse
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # keep nginx from buffering the stream
+}
+
+
+def sse_response(chunks) -> StreamingResponse:
+    """
+    Stream an async iterator of text chunks as server-sent events:
+    one `data: {"delta": ...}` event per chunk, then an `event: done`
+    carrying the full text.
+    """
+    async def events():
+        parts = []
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            parts.append(chunk)
+            yield f"data: {json.dumps({'delta': chunk})}\n\n"
+        yield f"event: done\ndata: {json.dumps({'text': ''.join(parts).strip()})}\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
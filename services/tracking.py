@@ -0,0 +1,179 @@
+# services/tracking.py
+import os
+import re
+import hmac
+import html
+import base64
+import hashlib
+import threading
+from collections import deque, Counter
+from urllib.parse import urlencode, urlparse
+
+TRACKING_BUFFER_SIZE = int(os.getenv("TRACKING_BUFFER_SIZE", "100000"))
+TRACKING_FLUSH_SECONDS = float(os.getenv("TRACKING_FLUSH_SECONDS", "5"))
+TRACKING_SECRET = os.getenv("TRACKING_SECRET")  # signs pixel and click links; tracking is off without it
+TRACKING_BASE_URL = os.getenv("TRACKING_BASE_URL")  # public URL of this app, used in outgoing mail
+
+# 1x1 transparent GIF
+PIXEL_GIF = base64.b64decode("R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7")
+
+OPEN, CLICK = "open", "click"
+
+
+class EventBuffer:
+    """
+    Fixed-size ring of (kind, lead_id) tracking events. Recording is a
+    single deque append; when the ring is full the oldest events are dropped
+    (and counted) instead of blocking the request.
+    """
+
+    def __init__(self, size: int = TRACKING_BUFFER_SIZE):
+        self._events = deque(maxlen=size)
+        self.recorded = self.flushed = 0
+
+    def record(self, kind: str, lead_id: int):
+        self._events.append((kind, lead_id))
+        self.recorded += 1
+
+    def drain(self) -> list:
+        events = []
+        pop = self._events.popleft
+        try:
+            while True:
+                events.append(pop())
+        except IndexError:
+            return events
+
+    def requeue(self, events: list):
+        """
+        Put drained events back at the front (e.g. after a failed flush),
+        ahead of anything recorded since. A full ring drops the newest.
+        """
+        self._events.extendleft(reversed(events))
+
+    def stats(self) -> dict:
+        pending = len(self._events)
+        return {
+            "pending": pending,
+            "recorded": self.recorded,
+            "flushed": self.flushed,
+            "dropped": max(0, self.recorded - self.flushed - pending),
+        }
+
+
+def aggregate(events: list) -> list:
+    """
+    Fold events into (lead_id, opens, clicks) rows, one per lead.
+    """
+    counts = Counter(events)
+    lead_ids = {lead_id for _, lead_id in counts}
+    return [(lead_id, counts[(OPEN, lead_id)], counts[(CLICK, lead_id)]) for lead_id in lead_ids]
+
+
+class TrackingFlusher:
+    """
+    Background thread that moves buffered events into the lead store every
+    TRACKING_FLUSH_SECONDS, as one batched counter update.
+    """
+
+    def __init__(self, buffer: EventBuffer, store, interval: float = TRACKING_FLUSH_SECONDS):
+        self.buffer = buffer
+        self.store = store
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self) -> int:
+        events = self.buffer.drain()
+        if not events:
+            return 0
+        try:
+            self.store.increment_counters(aggregate(events))
+            self.buffer.flushed += len(events)
+        except Exception as e:
+            # keep them for the next flush rather than losing the counts
+            self.buffer.requeue(events)
+            print(f"[Tracking] Flush of {len(events)} events failed, retrying next flush: {e}")
+            return 0
+        return len(events)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="tracking-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
+
+
+# ----------------- Signed links -----------------
+# Every pixel and click link carries an HMAC of the lead id (and target
+# URL), so nobody can record events for a lead or bounce visitors through
+# the redirect with links this app didn't send. Without TRACKING_SECRET
+# no links are issued and every event is refused.
+_URL = re.compile(r"https?://[^\s<>\"']+[^\s<>\"'.,;:!?)]")
+
+
+def enabled() -> bool:
+    return bool(TRACKING_SECRET and TRACKING_BASE_URL)
+
+
+def sign(lead_id: int, target: str) -> str:
+    message = f"{lead_id}:{target}".encode()
+    return hmac.new(TRACKING_SECRET.encode(), message, hashlib.sha256).hexdigest()[:16]
+
+
+def _valid(lead_id: int, target: str, sig: str | None) -> bool:
+    if not TRACKING_SECRET or not sig:
+        return False
+    return hmac.compare_digest(sig, sign(lead_id, target))
+
+
+def pixel_url(base_url: str, lead_id: int) -> str:
+    return f"{base_url.rstrip('/')}/t/open/{lead_id}.gif?{urlencode({'sig': sign(lead_id, OPEN)})}"
+
+
+def click_url(base_url: str, lead_id: int, url: str) -> str:
+    """
+    Tracked redirect link for `url`, e.g. to embed in an outgoing email.
+    """
+    params = {"url": url, "sig": sign(lead_id, url)}
+    return f"{base_url.rstrip('/')}/t/click/{lead_id}?{urlencode(params)}"
+
+
+def valid_open(lead_id: int, sig: str | None) -> bool:
+    return _valid(lead_id, OPEN, sig)
+
+
+def valid_redirect(lead_id: int, url: str, sig: str | None) -> bool:
+    if urlparse(url).scheme not in ("http", "https"):
+        return False
+    return _valid(lead_id, url, sig)
+
+
+def tracked_html(body: str, lead_id: int, base_url: str | None = None) -> str | None:
+    """
+    HTML version of a plain-text email for `lead_id`: links go through the
+    click redirect and an open pixel is appended. None when tracking is off.
+    """
+    base_url = base_url or TRACKING_BASE_URL
+    if not (TRACKING_SECRET and base_url):
+        return None
+    parts, last = [], 0
+    for match in _URL.finditer(body):
+        url = match.group(0)
+        parts.append(html.escape(body[last:match.start()]))
+        parts.append(f'<a href="{html.escape(click_url(base_url, lead_id, url))}">{html.escape(url)}</a>')
+        last = match.end()
+    parts.append(html.escape(body[last:]))
+    text = "".join(parts).replace("\n", "<br>\n")
+    pixel = f'<img src="{html.escape(pixel_url(base_url, lead_id))}" width="1" height="1" alt="">'
+    return f"<html><body>{text}\n{pixel}</body></html>"
+
+
+tracking_buffer = EventBuffer()
@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from services.email_index import EmailIndex
+from services.journal import Journal
+
+
+class EmailIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def open(self, **kwargs):
+        index = EmailIndex(os.path.join(self.dir, "emails.index.db"))
+        journal = Journal(os.path.join(self.dir, "emails.snapshot.jsonl"),
+                          os.path.join(self.dir, "emails.journal.jsonl"), index=index, **kwargs)
+        return journal, index
+
+    def lookup(self, journal, index, email_id):
+        seq = index.seq_for_id(email_id)
+        return journal.read(seq, index.location(seq)) if seq is not None else None
+
+    def test_lookups_follow_journal_writes(self):
+        journal, index = self.open()
+        a, b = journal.add_many([{"id": "a", "threadId": "t1"}, {"id": "b", "threadId": "t1"}])
+        journal.patch(a, {"tags": ["x"]})
+        journal.delete(b)
+
+        self.assertEqual(self.lookup(journal, index, "a"), {"id": "a", "threadId": "t1", "tags": ["x"]})
+        self.assertIsNone(index.seq_for_id("b"))
+        self.assertEqual(index.seqs_for_thread("t1"), [a])
+
+    def test_locations_survive_compaction(self):
+        journal, index = self.open(compact_every=2)
+        for i in range(5):
+            journal.add({"id": f"e{i}", "threadId": f"t{i}"})
+
+        for i in range(5):
+            self.assertEqual(self.lookup(journal, index, f"e{i}")["threadId"], f"t{i}")
+        self.assertEqual(index.max_seq(), 5)
+
+    def test_iter_after_cursor_matches_full_scan(self):
+        journal, _ = self.open(compact_every=4)
+        for i in range(10):
+            journal.add({"id": f"e{i}", "threadId": f"t{i}"})
+        journal.delete(3)
+        journal.patch(7, {"tags": ["x"]})
+        everything = list(journal.iter_records())
+
+        for cursor in range(0, 12):
+            self.assertEqual(list(journal.iter_records(after=cursor)),
+                             [(seq, r) for seq, r in everything if seq > cursor])
+
+    def test_reply_ids_survive_compaction_and_rebuild(self):
+        journal, index = self.open(compact_every=3)
+        seq = journal.add({"id": "a", "threadId": "t1"})
+        journal.push(seq, "replies", {"messageId": "m1", "body": "hi"})
+        index.replies_added([("m1", seq)])
+        journal.add({"id": "b", "threadId": "t2"})  # triggers compaction
+
+        self.assertTrue(index.has_reply("m1"))
+        os.remove(os.path.join(self.dir, "emails.index.db"))
+        journal, index = self.open()
+        journal.load()
+        self.assertTrue(index.has_reply("m1"))
+        self.assertFalse(index.has_reply("m2"))
+
+    def test_index_that_missed_writes_is_rebuilt_on_load(self):
+        journal, _ = self.open()
+        journal.add({"id": "a", "threadId": "t1"})
+        # a write the index never heard about, as after a crash between the two
+        journal.index = None
+        journal.add({"id": "b", "threadId": "t2"})
+
+        journal, index = self.open()
+        journal.load()
+
+        self.assertEqual(self.lookup(journal, index, "b"), {"id": "b", "threadId": "t2"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from services.journal import Journal
+
+
+class JournalRecoveryTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.snapshot = os.path.join(self.dir, "emails.snapshot.jsonl")
+        self.journal = os.path.join(self.dir, "emails.journal.jsonl")
+
+    def open(self, **kwargs):
+        return Journal(self.snapshot, self.journal, **kwargs)
+
+    def tear_last_line(self):
+        with open(self.journal, "ab") as f:
+            f.write(b'{"op": "add", "seq": 99, "rec')
+
+    def test_add_after_torn_line_on_restart(self):
+        journal = self.open()
+        journal.add({"id": "before-crash"})
+        self.tear_last_line()
+
+        journal = self.open()
+        seq = journal.add({"id": "after-crash"})
+
+        self.assertEqual(seq, 2)
+        self.assertEqual(self.open().records(), [{"id": "before-crash"}, {"id": "after-crash"}])
+
+    def test_add_after_torn_line_in_same_process(self):
+        journal = self.open()
+        journal.add({"id": "before-crash"})
+        self.tear_last_line()
+
+        journal.add({"id": "after-crash"})
+
+        self.assertEqual(self.open().records(), [{"id": "before-crash"}, {"id": "after-crash"}])
+
+    def test_torn_header_starts_a_fresh_journal(self):
+        with open(self.journal, "wb") as f:
+            f.write(b'{"epo')
+
+        journal = self.open()
+        journal.add({"id": "first"})
+
+        self.assertEqual(self.open().records(), [{"id": "first"}])
+
+    def test_compaction_keeps_records_and_ops(self):
+        journal = self.open(compact_every=3)
+        a = journal.add({"id": "a"})
+        b = journal.add({"id": "b"})
+        journal.patch(a, {"status": "sent"})
+        journal.push(b, "replies", "r1")
+        journal.delete(a)
+
+        self.assertEqual(self.open().records(), [{"id": "b", "replies": ["r1"]}])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+
+from services.send_ledger import SendLedger
+
+
+class SendLedgerTest(unittest.TestCase):
+    def setUp(self):
+        self.ledger = SendLedger(os.path.join(tempfile.mkdtemp(), "send_ledger.db"))
+
+    def test_sent_recipient_is_not_claimed_again(self):
+        self.assertIsNone(self.ledger.claim("bulk:1", "Ann@Example.com"))
+        self.ledger.mark_sent("bulk:1", "ann@example.com", "m1", "t1")
+
+        earlier = self.ledger.claim("bulk:1", " ann@example.com ")
+        self.assertEqual((earlier["status"], earlier["message_id"]), ("sent", "m1"))
+        # other campaigns are independent
+        self.assertIsNone(self.ledger.claim("bulk:2", "ann@example.com"))
+
+    def test_pending_send_is_never_retried(self):
+        self.ledger.claim("bulk:1", "ann@example.com")
+
+        self.assertEqual(self.ledger.claim("bulk:1", "ann@example.com")["status"], "pending")
+
+    def test_failed_send_can_be_retried(self):
+        self.ledger.claim("bulk:1", "ann@example.com")
+        self.ledger.mark_failed("bulk:1", "ann@example.com", "400 bad request")
+
+        self.assertIsNone(self.ledger.claim("bulk:1", "ann@example.com"))
+        self.assertEqual(self.ledger.get("bulk:1", "ann@example.com")["status"], "pending")
+
+    def test_once_replays_the_stored_response(self):
+        calls = []
+
+        def make_response():
+            calls.append(1)
+            return {"ok": True, "job_id": "j1"}
+
+        first = self.ledger.once("send-bulk:key", make_response)
+        second = self.ledger.once("send-bulk:key", make_response)
+
+        self.assertEqual(first, ({"ok": True, "job_id": "j1"}, False))
+        self.assertEqual(second, ({"ok": True, "job_id": "j1"}, True))
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()